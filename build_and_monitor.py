@@ -7,8 +7,12 @@ import pandas as pd
 import yaml
 
 from builder import BuilderApp, set_verbose as set_verbose_builder
+from infra import DBStateManager
 from monitor import MonitorApp, set_verbose as set_verbose_monitor
+from tools import dashboard, harness_trace
+from tools.app_sharding import parse_resource_limits
 from tools.app_utils import merge_dicts
+from tools.host_calibration import HostCalibration
 
 
 def set_verbose():
@@ -20,11 +24,18 @@ def start_infra(platform):
     subprocess.run(['./infra.py', '-p', f'{platform}', 'start'], check=True)
 
 
-def build_and_run_apps(build_type='jvm', app_type='all', platform='docker'):
-    b = BuilderApp(build_type, app_type)
+def build_and_run_apps(build_type='jvm', app_type='all', platform='docker', profile=None, memory_breakdown=False,
+                       calibration=None, drop_caches=False, db_seed=None, parallel=False, own_namespaces=False,
+                       quota=None, java_version=8):
+    # the schema generation of quarkus is a build time property, the seeded database state needs its own build
+    if db_seed is not None:
+        b = BuilderApp(build_type, app_type, DBStateManager.QUARKUS_BUILD_ARGS, DBStateManager.QUARKUS_VARIANT)
+    else:
+        b = BuilderApp(build_type, app_type)
     build_result = b.build()
 
-    m = MonitorApp(build_type, app_type, platform)
+    m = MonitorApp(build_type, app_type, platform, profile, memory_breakdown, calibration, drop_caches, db_seed,
+                   parallel, own_namespaces, quota, java_version)
     m.monitor('stop')
     monitor_result = m.monitor('start')
 
@@ -36,8 +47,39 @@ def main():
     parser.add_argument("-t", "--type", help="set app type", default='all', choices=['spring', 'quarkus', 'all'])
     parser.add_argument("-p", "--platform", help="set platform type", default='docker', choices=['docker', 'k8s'])
     parser.add_argument("-v", "--verbose", help="set verbose", default=False, type=bool)
+    parser.add_argument("--profile", help="capture class loading, GC and JIT logs (and JFR) of the JVM startup",
+                        default=None, choices=['log', 'jfr'])
+    parser.add_argument("--java-version", help="set the java version of the jvm images, it selects the JVM logging "
+                                               "flags of --profile", default=8, type=int)
+    parser.add_argument("--memory-breakdown", help="break down the startup memory usage with NMT and smaps",
+                        action='store_true')
+    parser.add_argument("--calibrate", help="fingerprint the host and run a calibration micro-benchmark first",
+                        action='store_true')
+    parser.add_argument("--calibration-baseline", help="normalise the startup times to this host calibration file",
+                        default=None)
+    parser.add_argument("--drop-caches", help="drop the page caches before every app start (needs root)",
+                        action='store_true')
+    parser.add_argument("--db-seed", help="seed the databases with the given number of todos, restore them before "
+                                          "the apps are started and verify them after", default=None, type=int)
+    parser.add_argument("--crossover", help="compare the quarkus jvm and native builds under load for the given "
+                                            "seconds from a cold start", default=None, type=int)
+    parser.add_argument("--dashboard", help="show a live terminal dashboard instead of the console log",
+                        action='store_true')
+    parser.add_argument("--trace", help="trace the platform calls and sleeps of the harness, save them as a chrome "
+                                        "trace and report the harness overhead of the startup times",
+                        action='store_true')
+    parser.add_argument("--k8s-parallel", help="deploy and watch all the apps at the same time on k8s",
+                        action='store_true')
+    parser.add_argument("--k8s-namespaces", help="deploy every app into its own namespace on k8s",
+                        action='store_true')
+    parser.add_argument("--k8s-quota", help="set the memory:cpus resource quota of the app namespaces, e.g. 1Gi:2",
+                        default=None)
     parser.add_argument("build_type", help="set build type", default='all', choices=['jvm', 'native', 'all'], nargs='?')
     args = parser.parse_args()
+    if (args.k8s_parallel or args.k8s_namespaces or args.k8s_quota) and args.platform != 'k8s':
+        parser.error('--k8s-parallel, --k8s-namespaces and --k8s-quota are supported on the k8s platform only')
+    if args.k8s_quota and not args.k8s_namespaces:
+        parser.error('--k8s-quota needs --k8s-namespaces')
 
     with open('log.yml', 'r') as f:
         log_cfg = yaml.safe_load(f.read())
@@ -48,18 +90,42 @@ def main():
 
     start_infra(args.platform)
 
+    if args.trace:
+        harness_trace.enable()
+    if args.dashboard:
+        dashboard.start()
+    try:
+        run(args)
+    finally:
+        dashboard.stop()
+        harness_trace.save()
+
+
+def run(args):
+    quota = parse_resource_limits([args.k8s_quota] if args.k8s_quota else None)[0]
+    calibration = None
+    if args.calibrate:
+        calibration = HostCalibration(baseline_file=args.calibration_baseline).calibrate()
+        dashboard.echo(f'Host fingerprint:\n{pd.Series(calibration.fingerprint)}\n')
+
     jvm_result = {}
     if args.build_type == 'all' or args.build_type == 'jvm':
-        jvm_result = build_and_run_apps('jvm', args.type, args.platform)
+        jvm_result = build_and_run_apps('jvm', args.type, args.platform, args.profile, args.memory_breakdown,
+                                        calibration, args.drop_caches, args.db_seed, args.k8s_parallel,
+                                        args.k8s_namespaces, quota, args.java_version)
         if jvm_result:
-            print(f'JVM result:\n{pd.DataFrame(jvm_result)}\n')
+            dashboard.echo(f'JVM result:\n{pd.DataFrame(jvm_result)}\n')
 
     native_result = {}
 
     if args.type != 'spring' and (args.build_type == 'all' or args.build_type == 'native'):
-        native_result = build_and_run_apps(build_type='native', platform=args.platform)
+        native_result = build_and_run_apps(build_type='native', platform=args.platform,
+                                           memory_breakdown=args.memory_breakdown, calibration=calibration,
+                                           drop_caches=args.drop_caches, db_seed=args.db_seed,
+                                           parallel=args.k8s_parallel, own_namespaces=args.k8s_namespaces,
+                                           quota=quota)
         if native_result:
-            print(f'GraalVM result:\n{pd.DataFrame(native_result)}\n')
+            dashboard.echo(f'GraalVM result:\n{pd.DataFrame(native_result)}\n')
 
     if jvm_result and native_result:
         result = {}
@@ -67,7 +133,11 @@ def main():
         result.update(native_result)
 
         if result:
-            print(f'Overall result:\n{pd.DataFrame(result)}\n')
+            dashboard.echo(f'Overall result:\n{pd.DataFrame(result)}\n')
+
+        if args.crossover and args.type != 'spring':
+            crossover_result = MonitorApp('all', 'quarkus', args.platform).crossover(args.crossover)
+            dashboard.echo(f'Crossover result:\n{pd.DataFrame.from_dict(crossover_result, orient="index")}\n')
 
 
 if __name__ == '__main__':
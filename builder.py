@@ -18,28 +18,39 @@ class SpringTodoAppBuilder(SpringAppBuilder):
 
 
 class QuarkusTodoAppBuilder(QuarkusAppBuilder):
-    def __init__(self, build_type='jvm'):
-        super(QuarkusTodoAppBuilder, self).__init__('todo-app/quarkus-todo-app', build_type)
+    def __init__(self, build_type='jvm', build_args=None):
+        super(QuarkusTodoAppBuilder, self).__init__('todo-app/quarkus-todo-app', build_type, build_args)
 
 
 class BuilderApp:
-    def __init__(self, build_type='jvm', app_type='all'):
+    def __init__(self, build_type='jvm', app_type='all', quarkus_build_args=None, quarkus_variant=None):
+        """quarkus_build_args are passed to the quarkus build, e.g. DBStateManager.QUARKUS_BUILD_ARGS
+
+        quarkus_variant tags the quarkus build as {image}-{variant} and keeps the default quarkus image.
+        """
         self.build_type = build_type
         self.type = app_type
+        self.quarkus_build_args = quarkus_build_args
+        self.quarkus_variant = quarkus_variant
 
     def build(self):
         builders = []
         if self.build_type == 'native':
-            builders = [QuarkusTodoAppBuilder(self.build_type)]
+            builders = [QuarkusTodoAppBuilder(self.build_type, self.quarkus_build_args)]
         else:
             if self.type == 'all' or self.type == 'spring':
                 builders.append(SpringTodoAppBuilder())
             if self.type == 'all' or self.type == 'quarkus':
-                builders.append(QuarkusTodoAppBuilder(self.build_type))
+                builders.append(QuarkusTodoAppBuilder(self.build_type, self.quarkus_build_args))
 
         result = {}
         for builder in builders:
-            result.update(builder.build())
+            if self.quarkus_variant and isinstance(builder, QuarkusAppBuilder):
+                with builder.keep_image(builder.image_name):
+                    result.update(builder.build())
+                    builder.tag_image(builder.image_name, f'{builder.image_name}-{self.quarkus_variant}')
+            else:
+                result.update(builder.build())
         return result
 
 
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 import argparse
+import logging
 import subprocess
+import time
 from pathlib import Path
 
 import docker
@@ -13,12 +15,19 @@ from tools.app_utils import read_dot_env_file
 from tools.globals import *
 
 INFRA_DIR = Path(__file__).cwd() / 'infra'
+DEFAULT_SEED_ROWS = 3
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InfraException(Exception):
+    pass
 
 
 class InfraManager:
 
-    def __init__(self):
-        self.dockerClient = docker.from_env()
+    def __init__(self, docker_host=None):
+        self.dockerClient = docker.DockerClient(base_url=docker_host) if docker_host else docker.from_env()
 
     def setup(self):
         self.create_log_folder()
@@ -54,6 +63,29 @@ class InfraManager:
     def stop(self):
         pass
 
+    def psql(self, *commands, database='postgres'):
+        pass
+
+    def query(self, sql, database='postgres'):
+        """returns the unaligned result of the query"""
+        pass
+
+    @staticmethod
+    def psql_command(commands, database, tuples_only=False):
+        db_user = read_dot_env_file(ENV_FILE)['POSTGRES_USER']
+        command = ['psql', '-q', '-v', 'ON_ERROR_STOP=1', '-U', db_user, '-d', database]
+        if tuples_only:
+            command += ['-t', '-A']
+        for c in commands:
+            command += ['-c', c]
+        return command
+
+    def seed(self, rows=DEFAULT_SEED_ROWS):
+        DBStateManager(self).seed(rows)
+
+    def restore(self):
+        DBStateManager(self).restore()
+
 
 class DCInfraManager(InfraManager):
 
@@ -79,6 +111,19 @@ class DCInfraManager(InfraManager):
     def stop(self):
         subprocess.run(['docker-compose', '-f', f'{INFRA_DIR}/docker-compose.yml', 'down'], check=True)
 
+    def psql(self, *commands, database='postgres'):
+        container = self.dockerClient.containers.get(DATABASE_HOST)
+        exit_code, output = container.exec_run(self.psql_command(commands, database))
+        if exit_code:
+            raise InfraException(f'psql failed on {database}: {str(output, "utf-8")}')
+
+    def query(self, sql, database='postgres'):
+        container = self.dockerClient.containers.get(DATABASE_HOST)
+        exit_code, output = container.exec_run(self.psql_command([sql], database, tuples_only=True))
+        if exit_code:
+            raise InfraException(f'psql failed on {database}: {str(output, "utf-8")}')
+        return str(output, 'utf-8').strip()
+
 
 class K8SInfraManager(InfraManager):
     INFRA_DB_DEPLOYMENT = 'infra-db-deployment'
@@ -92,8 +137,8 @@ class K8SInfraManager(InfraManager):
     GRAFANA_DATASOURCES_CONFIG = 'grafana-datasources'
     GRAFANA_DASHBOARDS_CONFIG = 'grafana-dashboards'
 
-    def __init__(self):
-        super(K8SInfraManager, self).__init__()
+    def __init__(self, docker_host=None):
+        super(K8SInfraManager, self).__init__(docker_host)
         k8s_config.load_kube_config()
         self.coreApi = k8s_client.CoreV1Api()
         self.appsApi = k8s_client.AppsV1Api()
@@ -170,6 +215,16 @@ class K8SInfraManager(InfraManager):
         self.stop_prometheus()
         self.stop_grafana()
 
+    def psql(self, *commands, database='postgres'):
+        subprocess.run(['kubectl', 'exec', '--namespace', TODO_APP_NAMESPACE, f'deployment/{self.INFRA_DB_DEPLOYMENT}',
+                        '--'] + self.psql_command(commands, database), check=True, stdout=subprocess.DEVNULL)
+
+    def query(self, sql, database='postgres'):
+        return subprocess.run(['kubectl', 'exec', '--namespace', TODO_APP_NAMESPACE,
+                               f'deployment/{self.INFRA_DB_DEPLOYMENT}', '--'] +
+                              self.psql_command([sql], database, tuples_only=True),
+                              check=True, capture_output=True, text=True).stdout.strip()
+
     def stop_infra_db(self):
         self.__delete_deployment(name=self.INFRA_DB_DEPLOYMENT)
         self.__delete_service(name=self.INFRA_DB_SERVICE)
@@ -211,16 +266,87 @@ class K8SInfraManager(InfraManager):
             print('failed!')
 
 
+class DBStateManager:
+    """snapshots the seeded todo databases as postgres template databases and restores them between the runs
+
+    Restoring is a file level copy of the template (CREATE DATABASE ... TEMPLATE), so every measured startup and
+    load test begins from the same data. It terminates the connections to the databases, so the apps are stopped
+    before it. The apps must not recreate the schema: the spring app is started with APP_ENVIRONMENT, the schema
+    generation and the import script of quarkus are build time properties (and %prod overrides the environment), so
+    the quarkus app is built with QUARKUS_BUILD_ARGS into the {image}-seeded images (QUARKUS_VARIANT), the default
+    images keep their schema generation. verify() checks the seeded rows after the apps are started.
+    """
+    TEMPLATE_POSTFIX = '_template'
+    TODO_SCHEMA = 'CREATE TABLE todo (id BIGSERIAL PRIMARY KEY, title VARCHAR(255), owner VARCHAR(255), ' \
+                  'created TIMESTAMP, modified TIMESTAMP)'
+    APP_ENVIRONMENT = {'SPRING_JPA_HIBERNATE_DDL_AUTO': 'none',
+                       'SPRING_DATASOURCE_INITIALIZATION_MODE': 'never'}
+    QUARKUS_BUILD_ARGS = ['-D%prod.quarkus.hibernate-orm.database.generation=none',
+                          '-D%prod.quarkus.hibernate-orm.sql-load-script=no-file']
+    QUARKUS_VARIANT = 'seeded'
+
+    def __init__(self, infra_manager, databases=None):
+        self.infraManager = infra_manager
+        self.databases = databases if databases else DATABASES
+        self.rows = None
+
+    def seed(self, rows=DEFAULT_SEED_ROWS):
+        for database in self.databases:
+            template = f'{database}{self.TEMPLATE_POSTFIX}'
+            print(f'seeding {template} with {rows} todos... ', end='')
+            self.infraManager.psql(f"UPDATE pg_database SET datistemplate = false WHERE datname = '{template}'",
+                                   f'DROP DATABASE IF EXISTS {template}',
+                                   f'CREATE DATABASE {template}')
+            self.infraManager.psql(self.TODO_SCHEMA,
+                                   f"INSERT INTO todo (title, created) SELECT 'Todo-' || i, current_timestamp "
+                                   f"FROM generate_series(1, {int(rows)}) AS i",
+                                   'ANALYZE todo',
+                                   database=template)
+            self.infraManager.psql(f'ALTER DATABASE {template} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false')
+            print('done!')
+        self.rows = int(rows)
+
+    def restore(self):
+        start_time = time.time()
+        for database in self.databases:
+            self.infraManager.psql(self.__terminate_connections(database),
+                                   f'DROP DATABASE IF EXISTS {database}',
+                                   f'CREATE DATABASE {database} TEMPLATE {database}{self.TEMPLATE_POSTFIX}')
+        elapsed = round((time.time() - start_time) * 1000, 1)
+        LOGGER.info(f'databases are restored in {elapsed}ms')
+        return elapsed
+
+    def verify(self):
+        """checks that the started apps kept the seeded rows, i.e. they did not recreate the schema or import data"""
+        for database in self.databases:
+            rows = int(self.infraManager.query('SELECT count(*) FROM todo', database=database))
+            if rows != self.rows:
+                raise InfraException(f'{database} has {rows} todos instead of the seeded {self.rows}, the app '
+                                     f'recreated the schema or loaded its import script (the quarkus app needs a '
+                                     f'build with QUARKUS_BUILD_ARGS, e.g. build_and_monitor.py --db-seed)')
+        LOGGER.debug(f'{", ".join(self.databases)} have the seeded {self.rows} todos')
+
+    @staticmethod
+    def __terminate_connections(database):
+        return f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity " \
+               f"WHERE datname = '{database}' AND pid <> pg_backend_pid()"
+
+
 def main():
     parser = argparse.ArgumentParser(description='Manage the infrastructure',
                                      formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("-p", "--platform", help="set platform type", default='docker', choices=['docker', 'k8s'])
-    parser.add_argument("action_command", help="set action command", default='start', choices=['start', 'stop'],
-                        nargs='?')
+    parser.add_argument("-r", "--rows", help="set the number of todos to seed", default=DEFAULT_SEED_ROWS, type=int)
+    parser.add_argument("action_command", help="set action command", default='start',
+                        choices=['start', 'stop', 'seed', 'restore'], nargs='?')
     args = parser.parse_args()
 
     managers = {'docker': DCInfraManager, 'k8s': K8SInfraManager}
-    getattr(managers[args.platform](), args.action_command)()
+    manager = managers[args.platform]()
+    if args.action_command == 'seed':
+        manager.seed(args.rows)
+    else:
+        getattr(manager, args.action_command)()
 
 
 if __name__ == '__main__':
@@ -1,23 +1,67 @@
 #!/usr/bin/env python3
 import argparse
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import yaml
 
+from infra import DBStateManager, DCInfraManager, K8SInfraManager
+from tools import dashboard, harness_trace
 from tools.app_monitor import SpringAppMonitor, QuarkusAppMonitor, set_verbose as set_verbose_app_monitor
-from tools.platform import set_verbose as set_verbose_platform
+from tools.app_crossover import CrossoverAnalysis, set_verbose as set_verbose_app_crossover
+from tools.app_herd import HerdBenchmark, set_verbose as set_verbose_app_herd
+from tools.app_efficiency import EfficiencyTest, set_verbose as set_verbose_app_efficiency
+from tools.app_profiler import StartupProfiler, MemoryProfiler, set_verbose as set_verbose_app_profiler
+from tools.app_sharding import ShardedRunner, parse_resource_limits, set_verbose as set_verbose_app_sharding
+from tools.app_rollout import RolloutBenchmark, set_verbose as set_verbose_app_rollout
+from tools.app_soak import SoakTest, set_verbose as set_verbose_app_soak
+from tools.globals import TODO_APP_NAMESPACE
+from tools.harness_trace import set_verbose as set_verbose_harness_trace
+from tools.host_calibration import HostCalibration, set_verbose as set_verbose_host_calibration
+from tools.platform import KubernetesPlatformManager, PlatformException, set_verbose as set_verbose_platform
+
+LOGGER = logging.getLogger(__name__)
 
 
 def set_verbose():
     set_verbose_platform()
     set_verbose_app_monitor()
+    set_verbose_app_profiler()
+    set_verbose_app_soak()
+    set_verbose_app_efficiency()
+    set_verbose_app_rollout()
+    set_verbose_app_sharding()
+    set_verbose_host_calibration()
+    set_verbose_app_crossover()
+    set_verbose_harness_trace()
+    set_verbose_app_herd()
+
+
+def create_profilers(name, jvm=True, profile=None, memory_breakdown=False, java_version=8):
+    """java_version selects the JVM logging flags of the startup profiler, both todo app jvm images run java 8"""
+    profilers = []
+    # native images have no JVM to profile
+    if profile and jvm:
+        profilers.append(StartupProfiler(name, jfr=profile == 'jfr', java_version=java_version))
+    if memory_breakdown:
+        profilers.append(MemoryProfiler(name, jvm))
+    return profilers
 
 
 class SpringTodoAppMonitor(SpringAppMonitor):
 
-    def __init__(self, platform='docker'):
+    def __init__(self, platform='docker', profile=None, memory_breakdown=False, platform_options=None,
+                 environment=None, container_name=None, host_port=None, java_version=8, image_name=None,
+                 container_port=8090, timeout=120):
         name = 'spring-todo-app'
-        super().__init__(image_name=f'{name}:latest', container_name=name, container_port=8090, platform=platform)
+        container_name = container_name if container_name else name
+        super().__init__(image_name=f'{image_name or name}:latest', container_name=container_name,
+                         container_port=container_port, platform=platform, timeout=timeout,
+                         profilers=create_profilers(container_name, True, profile, memory_breakdown, java_version),
+                         platform_options=platform_options, environment=environment, host_port=host_port)
+        self.build_type = 'jvm'
 
     def start(self):
         super().run()
@@ -29,11 +73,17 @@ class SpringTodoAppMonitor(SpringAppMonitor):
 
 class QuarkusTodoAppMonitor(QuarkusAppMonitor):
 
-    def __init__(self, build_type='jvm', platform='docker'):
-        port = 8091 if build_type == 'jvm' else 8092
+    def __init__(self, build_type='jvm', platform='docker', profile=None, memory_breakdown=False,
+                 platform_options=None, environment=None, container_name=None, host_port=None, java_version=8,
+                 image_name=None, container_port=8091, timeout=120):
+        port = host_port if host_port else 8091 if build_type == 'jvm' else 8092
         name = f'quarkus-todo-app-{build_type}'
-        super().__init__(image_name=f'{name}:latest', container_name=name, container_port=8091, host_port=port,
-                         platform=platform)
+        container_name = container_name if container_name else name
+        super().__init__(image_name=f'{image_name or name}:latest', container_name=container_name,
+                         container_port=container_port, host_port=port, platform=platform, timeout=timeout,
+                         profilers=create_profilers(container_name, build_type == 'jvm', profile, memory_breakdown,
+                                                    java_version),
+                         platform_options=platform_options, environment=environment)
         self.build_type = build_type
 
     def start(self):
@@ -45,26 +95,196 @@ class QuarkusTodoAppMonitor(QuarkusAppMonitor):
 
 
 class MonitorApp:
-    def __init__(self, build_type='jvm', app_type='all', platform='docker'):
+    def __init__(self, build_type='jvm', app_type='all', platform='docker', profile=None, memory_breakdown=False,
+                 calibration=None, drop_caches=False, db_seed=None, parallel=False, own_namespaces=False, quota=None,
+                 java_version=8):
         self.type = app_type
         self.build_type = build_type
         self.platform = platform
+        self.profile = profile
+        self.memory_breakdown = memory_breakdown
+        self.calibration = calibration
+        self.drop_caches = drop_caches
+        self.db_seed = db_seed
+        self.parallel = parallel
+        self.own_namespaces = own_namespaces
+        self.quota = quota
+        self.java_version = java_version
+        self.monitors = []
 
-    def monitor(self, action_command='start'):
-        monitors = []
+    def app_names(self):
+        names = []
         if self.type != 'spring' and (self.build_type == 'all' or self.build_type == 'native'):
-            monitors.append(QuarkusTodoAppMonitor('native', self.platform))
+            names.append('quarkus-todo-app-native')
         if self.build_type == 'all' or self.build_type == 'jvm':
             if self.type == 'all' or self.type == 'spring':
-                monitors.append(SpringTodoAppMonitor(platform=self.platform))
+                names.append('spring-todo-app')
             if self.type == 'all' or self.type == 'quarkus':
-                monitors.append(QuarkusTodoAppMonitor('jvm', self.platform))
+                names.append('quarkus-todo-app-jvm')
+        return names
+
+    def create_monitor(self, app_name, platform_options=None, container_name=None, host_port=None, image_name=None,
+                       container_port=None, environment=None, timeout=120, framework=None):
+        """container_name and host_port run another instance of the app, e.g. for the herd benchmark
+
+        image_name runs another build of the app, e.g. a build variant of a scenario. framework (spring or quarkus)
+        is taken from the app name of the todo apps if it is not set.
+        """
+        environment = dict(environment or {})
+        if self.db_seed is not None:
+            # the seeded database state must not be recreated by the apps
+            environment.update(DBStateManager.APP_ENVIRONMENT)
+        if self.platform == 'k8s' and self.own_namespaces and platform_options is None:
+            platform_options = {'own_namespace': True, 'quota': self.quota}
+        if framework is None:
+            framework = 'spring' if app_name == 'spring-todo-app' else 'quarkus'
+        if framework == 'quarkus' and image_name is None:
+            image_name = self.image_name(app_name)
+        if framework == 'spring':
+            return SpringTodoAppMonitor(self.platform, self.profile, self.memory_breakdown, platform_options,
+                                        environment or None, container_name, host_port, self.java_version,
+                                        image_name, container_port or 8090, timeout)
+        build_type = app_name.rsplit('-', 1)[1]
+        return QuarkusTodoAppMonitor(build_type, self.platform, self.profile, self.memory_breakdown, platform_options,
+                                     environment or None, container_name, host_port, self.java_version, image_name,
+                                     container_port or 8091, timeout)
+
+    def image_name(self, app_name):
+        """the seeded database state needs the quarkus build without schema generation, see DBStateManager"""
+        if self.db_seed is not None and app_name != 'spring-todo-app':
+            return f'{app_name}-{DBStateManager.QUARKUS_VARIANT}'
+        return app_name
+
+    def create_db_state(self, docker_host=None):
+        if docker_host:
+            return DBStateManager(DCInfraManager(docker_host))
+        managers = {'docker': DCInfraManager, 'k8s': K8SInfraManager}
+        return DBStateManager(managers[self.platform]())
+
+    def create_monitors(self):
+        return [self.create_monitor(app_name) for app_name in self.app_names()]
+
+    def monitor(self, action_command='start'):
+        self.monitors = self.create_monitors()
 
         is_start = action_command == 'start'
+        db_state = self.create_db_state() if is_start and self.db_seed is not None else None
+        if db_state:
+            db_state.seed(self.db_seed)
+
+        if self.parallel:
+            return self.__monitor_parallel(is_start, db_state)
+
+        if db_state:
+            # restoring terminates the database connections, the apps are stopped and the databases are restored
+            # once, so the apps started before the next one keep running
+            for monitor in self.monitors:
+                monitor.stop()
+            db_state.restore()
+
         result = {}
-        for monitor in monitors:
+        for monitor in self.monitors:
+            if is_start and self.drop_caches:
+                HostCalibration.drop_page_caches()
             result.update(monitor.start()) if is_start else monitor.stop()
+            if db_state:
+                db_state.verify()
+
+        if is_start and self.calibration:
+            self.calibration.annotate(result)
+        return result
 
+    def __monitor_parallel(self, is_start, db_state):
+        """deploys and watches all the apps at the same time on k8s, the teardown is a bulk label selector delete"""
+        # the shared namespace is always cleaned up, its node ports would clash with the per-app namespaces
+        namespaces = {TODO_APP_NAMESPACE} | {monitor.platformManager.namespace for monitor in self.monitors}
+        KubernetesPlatformManager.delete_apps(namespaces)
+        if not is_start:
+            return {}
+
+        if db_state:
+            db_state.restore()
+        if self.drop_caches:
+            HostCalibration.drop_page_caches()
+        # every monitor measures its own app in its own thread from its own deployment
+        with ThreadPoolExecutor(max_workers=len(self.monitors)) as executor:
+            tables = list(executor.map(lambda monitor: monitor.start(), self.monitors))
+        if db_state:
+            db_state.verify()
+
+        result = {}
+        for table in tables:
+            result.update(table)
+        if self.calibration:
+            self.calibration.annotate(result)
+        return result
+
+    def herd(self, sizes):
+        """cold starts growing numbers of instances of every app at the same moment, one app after the other"""
+        result = {}
+        for app_name in self.app_names():
+            benchmark = HerdBenchmark(app_name, lambda container_name, host_port, name=app_name:
+                                      self.create_monitor(name, container_name=container_name, host_port=host_port),
+                                      sizes)
+            result.update(benchmark.run())
+        return result
+
+    def shard(self, docker_hosts, iterations=1, resource_limits=None):
+        """runs the apps x resource limits x iterations matrix spread over the docker hosts"""
+        jobs = [(app_name, resources, iteration)
+                for app_name in self.app_names()
+                for resources in parse_resource_limits(resource_limits)
+                for iteration in range(iterations)]
+        db_states = {}
+        if self.db_seed is not None:
+            db_states = {docker_host: self.create_db_state(docker_host) for docker_host in docker_hosts}
+        runner = ShardedRunner(docker_hosts, jobs, self.create_monitor,
+                               before_job=lambda docker_host: db_states[docker_host].restore() if db_states else None)
+        runner.setup([f'{self.image_name(app_name)}:latest' for app_name in self.app_names()])
+        for db_state in db_states.values():
+            db_state.seed(self.db_seed)
+        runner.calibrate()
+        return runner.run()
+
+    def crossover(self, duration=300, window=5):
+        """starts the quarkus jvm and native builds from cold and compares them under the same load"""
+        analysis = CrossoverAnalysis('quarkus-todo-app', self.create_monitor('quarkus-todo-app-jvm'),
+                                     self.create_monitor('quarkus-todo-app-native'), duration, window)
+        return analysis.run()
+
+    def soak(self, duration, interval=60, rate=20, max_memory_drift=10.0, max_latency_drift=5.0):
+        """soaks the started apps at the same time, returns the drift table and whether every app passed"""
+        soak_tests = [SoakTest(monitor.container_name, monitor.platformManager, monitor.build_type == 'jvm',
+                               duration, interval, rate, max_memory_drift, max_latency_drift)
+                      for monitor in self.monitors]
+        with ThreadPoolExecutor(max_workers=max(1, len(soak_tests))) as executor:
+            passed = all(list(executor.map(SoakTest.run, soak_tests)))
+
+        result = {}
+        for soak_test in soak_tests:
+            result[soak_test.app_name] = soak_test.get_result()
+        return result, passed
+
+    def efficiency(self, duration=60, warmup=30, cpu_price=EfficiencyTest.CPU_PRICE,
+                   memory_price=EfficiencyTest.MEMORY_PRICE):
+        """load tests the started apps one after the other and ranks them by the cost per million requests"""
+        result = {}
+        for monitor in self.monitors:
+            test = EfficiencyTest(monitor.container_name, monitor.platformManager, duration, warmup,
+                                  cpu_price=cpu_price, memory_price=memory_price)
+            try:
+                result[monitor.container_name] = test.run()
+            except PlatformException as e:
+                LOGGER.error(f'skipping the efficiency of {monitor.container_name}, its CPU time is unknown: {e}')
+        return EfficiencyTest.rank(result)
+
+    def rollout(self, iterations=3, replicas=2, slow_threshold=500):
+        """runs the rolling restart and pod deletion benchmark on the started apps one after the other"""
+        result = {}
+        for monitor in self.monitors:
+            benchmark = RolloutBenchmark(monitor.container_name, monitor.platformManager, replicas, iterations,
+                                         slow_threshold=slow_threshold)
+            result.update(benchmark.run())
         return result
 
 
@@ -75,9 +295,75 @@ def main():
     parser.add_argument("-b", "--build_type", help="set build type", default='all', choices=['jvm', 'native', 'all'])
     parser.add_argument("-p", "--platform", help="set platform type", default='docker', choices=['docker', 'k8s'])
     parser.add_argument("-v", "--verbose", help="set verbose", default=False, type=bool)
+    parser.add_argument("--profile", help="capture class loading, GC and JIT logs (and JFR) of the JVM startup",
+                        default=None, choices=['log', 'jfr'])
+    parser.add_argument("--java-version", help="set the java version of the jvm images, it selects the JVM logging "
+                                               "flags of --profile", default=8, type=int)
+    parser.add_argument("--memory-breakdown", help="break down the startup memory usage with NMT and smaps",
+                        action='store_true')
+    parser.add_argument("--soak", help="soak the started apps with a steady /todos workload for the given hours",
+                        default=None, type=float)
+    parser.add_argument("--soak-interval", help="set the soak sampling interval in seconds", default=60, type=int)
+    parser.add_argument("--soak-rate", help="set the soak workload in requests per second", default=20, type=int)
+    parser.add_argument("--max-memory-drift", help="fail the soak above this memory growth in Mb/h", default=10.0,
+                        type=float)
+    parser.add_argument("--max-latency-drift", help="fail the soak above this p99 growth in ms/h", default=5.0,
+                        type=float)
+    parser.add_argument("--efficiency", help="load test the started apps for the given seconds and rank them by "
+                                             "throughput per core, per GiB and cost", default=None, type=int)
+    parser.add_argument("--efficiency-warmup", help="set the load test warmup in seconds", default=30, type=int)
+    parser.add_argument("--cpu-price", help="set the price of a vCPU-hour", default=EfficiencyTest.CPU_PRICE,
+                        type=float)
+    parser.add_argument("--memory-price", help="set the price of a GiB-hour", default=EfficiencyTest.MEMORY_PRICE,
+                        type=float)
+    parser.add_argument("--rollout", help="run the given iterations of rolling restarts and pod deletions under load "
+                                          "(k8s only)", default=None, type=int)
+    parser.add_argument("--rollout-replicas", help="set the replicas during the rollout benchmark", default=2,
+                        type=int)
+    parser.add_argument("--slow-threshold", help="count requests slower than this in ms as slow", default=500,
+                        type=int)
+    parser.add_argument("--docker-hosts", help="spread the benchmark over these docker hosts, e.g. tcp://host:2375",
+                        default=None, nargs='+')
+    parser.add_argument("--iterations", help="set the iterations of each app on the docker hosts", default=1,
+                        type=int)
+    parser.add_argument("--resource-limits", help="set the memory:cpus limits to benchmark on the docker hosts, "
+                                                  "e.g. 512m:1 1g:2", default=None, nargs='+')
+    parser.add_argument("--calibrate", help="fingerprint the host and run a calibration micro-benchmark first",
+                        action='store_true')
+    parser.add_argument("--calibration-baseline", help="normalise the startup times to this host calibration file",
+                        default=None)
+    parser.add_argument("--drop-caches", help="drop the page caches before every app start (needs root)",
+                        action='store_true')
+    parser.add_argument("--db-seed", help="seed the databases with the given number of todos, restore them before "
+                                          "the apps are started and verify them after, the quarkus apps run the "
+                                          "-seeded images of build_and_monitor.py --db-seed", default=None, type=int)
+    parser.add_argument("--crossover", help="compare the quarkus jvm and native builds under load for the given "
+                                            "seconds from a cold start", default=None, type=int)
+    parser.add_argument("--dashboard", help="show a live terminal dashboard instead of the console log",
+                        action='store_true')
+    parser.add_argument("--trace", help="trace the platform calls and sleeps of the harness, save them as a chrome "
+                                        "trace and report the harness overhead of the startup times",
+                        action='store_true')
+    parser.add_argument("--k8s-parallel", help="deploy and watch all the apps at the same time on k8s",
+                        action='store_true')
+    parser.add_argument("--k8s-namespaces", help="deploy every app into its own namespace on k8s",
+                        action='store_true')
+    parser.add_argument("--k8s-quota", help="set the memory:cpus resource quota of the app namespaces, e.g. 1Gi:2",
+                        default=None)
+    parser.add_argument("--herd", help="cold start these numbers of instances of every app at the same moment and "
+                                       "report the time-to-ready distribution instead of the single app startup",
+                        nargs='+', type=int, default=None)
     parser.add_argument("action_command", help="set action command", default='start', choices=['start', 'stop'],
                         nargs='?')
     args = parser.parse_args()
+    if args.rollout and args.platform != 'k8s':
+        parser.error('--rollout is supported on the k8s platform only')
+    if args.docker_hosts and args.platform != 'docker':
+        parser.error('--docker-hosts is supported on the docker platform only')
+    if (args.k8s_parallel or args.k8s_namespaces or args.k8s_quota) and args.platform != 'k8s':
+        parser.error('--k8s-parallel, --k8s-namespaces and --k8s-quota are supported on the k8s platform only')
+    if args.k8s_quota and not args.k8s_namespaces:
+        parser.error('--k8s-quota needs --k8s-namespaces')
 
     import logging.config
     with open('log.yml', 'r') as f:
@@ -87,10 +373,60 @@ def main():
     if args.verbose:
         set_verbose()
 
-    m = MonitorApp(args.build_type, args.type, args.platform)
+    if args.trace:
+        harness_trace.enable()
+    if args.dashboard:
+        dashboard.start()
+    try:
+        passed = run(args)
+    finally:
+        dashboard.stop()
+        harness_trace.save()
+    if not passed:
+        sys.exit(1)
+
+
+def run(args):
+    calibration = None
+    if args.calibrate and args.action_command == 'start':
+        calibration = HostCalibration(baseline_file=args.calibration_baseline).calibrate()
+        dashboard.echo(f'Host fingerprint:\n{pd.Series(calibration.fingerprint)}\n')
+
+    m = MonitorApp(args.build_type, args.type, args.platform, args.profile, args.memory_breakdown, calibration,
+                   args.drop_caches, args.db_seed, args.k8s_parallel, args.k8s_namespaces,
+                   parse_resource_limits([args.k8s_quota] if args.k8s_quota else None)[0], args.java_version)
+    if args.docker_hosts and args.action_command == 'start':
+        result = m.shard(args.docker_hosts, args.iterations, args.resource_limits)
+        dashboard.echo(f'{pd.DataFrame.from_dict(result, orient="index")}')
+        return True
+
+    if args.herd and args.action_command == 'start':
+        result = m.herd(args.herd)
+        dashboard.echo(f'Herd result:\n{pd.DataFrame.from_dict(result, orient="index")}')
+        return True
+
     result = m.monitor(args.action_command)
     if result:
-        print(f'{pd.DataFrame(result)}')
+        dashboard.echo(f'{pd.DataFrame(result)}')
+
+    if args.crossover and args.action_command == 'start':
+        crossover_result = m.crossover(args.crossover)
+        dashboard.echo(f'Crossover result:\n{pd.DataFrame.from_dict(crossover_result, orient="index")}')
+
+    if args.efficiency and args.action_command == 'start':
+        efficiency_result = m.efficiency(args.efficiency, args.efficiency_warmup, args.cpu_price, args.memory_price)
+        dashboard.echo(f'Efficiency result:\n{pd.DataFrame.from_dict(efficiency_result, orient="index")}')
+
+    if args.rollout and args.action_command == 'start':
+        rollout_result = m.rollout(args.rollout, args.rollout_replicas, args.slow_threshold)
+        dashboard.echo(f'Rollout result:\n{pd.DataFrame.from_dict(rollout_result, orient="index")}')
+
+    if args.soak and args.action_command == 'start':
+        soak_result, passed = m.soak(args.soak, args.soak_interval, args.soak_rate, args.max_memory_drift,
+                                     args.max_latency_drift)
+        dashboard.echo(f'Soak result:\n{pd.DataFrame(soak_result)}')
+        return passed
+    return True
 
 
 if __name__ == '__main__':
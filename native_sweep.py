@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import argparse
+import logging.config
+import sys
+
+import pandas as pd
+import yaml
+
+from build_and_monitor import start_infra
+from builder import set_verbose as set_verbose_builder
+from monitor import set_verbose as set_verbose_monitor
+from tools.native_sweep import NativeBuildSweep, NativeSweepException, native_variants, \
+    set_verbose as set_verbose_sweep
+
+
+def set_verbose():
+    set_verbose_monitor()
+    set_verbose_builder()
+    set_verbose_sweep()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds and benchmarks the Quarkus Todo app with a matrix of '
+                                                 'native-image options',
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-v", "--verbose", help="set verbose", default=False, type=bool)
+    parser.add_argument("--path", help="set the path of the quarkus app", default='todo-app/quarkus-todo-app')
+    parser.add_argument("--gc", help="set the garbage collectors, G1 is skipped where it is not available",
+                        nargs='+', choices=NativeBuildSweep.GCS, default=None)
+    parser.add_argument("--optimization", help="set the -O levels, e.g. b 0 1 2 3", nargs='+', default=None)
+    parser.add_argument("--march", help="set the -march values, e.g. compatibility native", nargs='+',
+                        default=None)
+    parser.add_argument("--pgo", help="add the profile-guided variant of every variant", action='store_true')
+    parser.add_argument("--training-duration", help="set the seconds of the PGO training run on /todos",
+                        default=60, type=int)
+    parser.add_argument("--duration", help="set the seconds of the throughput test", default=60, type=int)
+    parser.add_argument("--warmup", help="set the warmup seconds of the throughput test", default=30, type=int)
+    parser.add_argument("--concurrency", help="set the concurrency of the training and throughput load", default=8,
+                        type=int)
+    parser.add_argument("--builder-image", help="set the GraalVM or Mandrel image building the native images, "
+                                                "the default of quarkus 1.2.0.Final is too old for the swept options",
+                        default=None)
+    parser.add_argument("--plan", help="only print the variants of the sweep", action='store_true')
+    args = parser.parse_args()
+
+    with open('log.yml', 'r') as f:
+        log_cfg = yaml.safe_load(f.read())
+        logging.config.dictConfig(log_cfg)
+
+    if args.verbose:
+        set_verbose()
+
+    sweep = NativeBuildSweep(args.path, native_variants(args.gc, args.optimization, args.march, args.pgo),
+                             args.builder_image, training=args.training_duration, duration=args.duration,
+                             warmup=args.warmup, concurrency=args.concurrency)
+    variants = {sweep.image_name(variant): {'build-args': ' '.join(sweep.build_args(variant))}
+                for variant in sweep.variants}
+    print(f'Native build variants:\n{pd.DataFrame.from_dict(variants, orient="index")}\n')
+    if args.plan:
+        return
+
+    start_infra('docker')
+    try:
+        result = sweep.run()
+    except NativeSweepException as e:
+        sys.exit(str(e))
+    print(pd.DataFrame.from_dict(result, orient="index"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+import argparse
+import logging.config
+import sys
+from contextlib import ExitStack
+
+import pandas as pd
+import yaml
+
+from build_and_monitor import start_infra
+from builder import set_verbose as set_verbose_builder
+from infra import DBStateManager, DCInfraManager, K8SInfraManager
+from monitor import MonitorApp, set_verbose as set_verbose_monitor
+from tools import harness_trace
+from tools.app_builder import AppBuilder, SpringAppBuilder, QuarkusAppBuilder
+from tools.app_efficiency import EfficiencyTest
+from tools.scenario import Scenario, ScenarioException, set_verbose as set_verbose_scenario
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    set_verbose_monitor()
+    set_verbose_builder()
+    set_verbose_scenario()
+
+
+class ScenarioApp:
+    """builds and runs the job plan of a scenario spec, see tools/scenario.py"""
+
+    def __init__(self, scenario, spec_file=None):
+        self.scenario = scenario
+        self.spec_file = spec_file
+        self.buildResult = {}
+
+    def plan(self):
+        table = {}
+        for job in self.scenario.jobs():
+            build = job['build']
+            table[Scenario.job_name(job)] = {'app': build['app']['name'],
+                                             'build-type': build['type'],
+                                             'variants': ','.join(build['variants']),
+                                             'build-args': ' '.join(build['args']),
+                                             'resources': job['resources'] or '',
+                                             'iteration': job['iteration'] + 1}
+        return table
+
+    def build(self):
+        """builds every unique build of the scenario once into its own tag, the base images are restored"""
+        builds = self.scenario.builds()
+        with ExitStack() as stack:
+            for base_image in dict.fromkeys(build['base_image'] for build in builds):
+                stack.enter_context(AppBuilder.keep_image(base_image))
+            for build in builds:
+                app = build['app']
+                if app['framework'] == 'spring':
+                    builder = SpringAppBuilder(app['path'], build['args'])
+                else:
+                    # the schema generation of quarkus is a build time property, the seeded database state needs it off
+                    seed_args = DBStateManager.QUARKUS_BUILD_ARGS if self.scenario.spec['db_seed'] is not None else []
+                    builder = QuarkusAppBuilder(app['path'], build['type'], build['args'] + seed_args)
+                table = builder.build()
+                builder.tag_image(build['base_image'], build['image'])
+                self.buildResult[build['image']] = table[build['base_image']]
+        return self.buildResult
+
+    def create_monitor(self, job):
+        spec = self.scenario.spec
+        build = job['build']
+        app = build['app']
+        metrics = self.scenario.metrics
+        monitor_app = MonitorApp(build['type'], app['framework'], self.scenario.platform,
+                                 profile='jfr' if 'jfr' in metrics else 'log' if 'profile' in metrics else None,
+                                 memory_breakdown='memory-breakdown' in metrics, db_seed=spec['db_seed'],
+                                 java_version=app['java_version'])
+        return monitor_app.create_monitor(build['base_image'], self.scenario.platform_options(job['resources']),
+                                          container_name=build['image'], host_port=app['host_port'],
+                                          image_name=build['image'], container_port=app['container_port'],
+                                          environment=spec['environment'], timeout=spec['startup']['timeout'],
+                                          framework=app['framework'])
+
+    def run(self):
+        spec = self.scenario.spec
+        if 'harness-overhead' in self.scenario.metrics:
+            harness_trace.enable()
+        db_state = None
+        if spec['db_seed'] is not None:
+            managers = {'docker': DCInfraManager, 'k8s': K8SInfraManager}
+            db_state = DBStateManager(managers[self.scenario.platform]())
+            db_state.seed(spec['db_seed'])
+
+        result = {}
+        for job in self.scenario.jobs():
+            name = Scenario.job_name(job)
+            monitor = None
+            try:
+                if db_state:
+                    db_state.restore()
+                monitor = self.create_monitor(job)
+                monitor.run()
+                if db_state:
+                    db_state.verify()
+                row = monitor.get_result_table(name)[name]
+                if 'efficiency' in self.scenario.metrics:
+                    for load in spec['load']:
+                        test = EfficiencyTest(name, monitor.platformManager, load['duration'], load['warmup'],
+                                              load['concurrency'], rate=load['rate'])
+                        row.update({f'{load["name"]}-{column}': value for column, value in test.run().items()})
+            except Exception as e:
+                # a failed job is reported, the rest of the matrix still runs
+                LOGGER.error(f'{name} failed: {e}')
+                row = {'error': str(e)}
+            finally:
+                if monitor:
+                    monitor.platformManager.stop_app()
+            row.update(self.buildResult.get(job['build']['image'], {}))
+            row['spec'] = self.scenario.stamp()
+            result[name] = row
+        harness_trace.save(f'{self.scenario.name}-{self.scenario.hash}-trace.json')
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmark scenario of a spec file',
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-v", "--verbose", help="set verbose", default=False, type=bool)
+    parser.add_argument("--plan", help="only print the job plan of the scenario", action='store_true')
+    parser.add_argument("--skip-build", help="use the already built images", action='store_true')
+    parser.add_argument("spec_file", help="set the scenario spec file", default='scenarios/default.yml', nargs='?')
+    args = parser.parse_args()
+
+    with open('log.yml', 'r') as f:
+        log_cfg = yaml.safe_load(f.read())
+        logging.config.dictConfig(log_cfg)
+
+    if args.verbose:
+        set_verbose()
+
+    try:
+        scenario = Scenario.load(args.spec_file)
+    except ScenarioException as e:
+        sys.exit(f'{args.spec_file}: {e}')
+
+    app = ScenarioApp(scenario, args.spec_file)
+    print(f'Job plan of {scenario.stamp()}:\n{pd.DataFrame.from_dict(app.plan(), orient="index")}\n')
+    if args.plan:
+        return
+
+    start_infra(scenario.platform)
+    if not args.skip_build:
+        app.build()
+    result = app.run()
+    scenario.save(result, args.spec_file)
+    print(f'Result of {scenario.stamp()}:\n{pd.DataFrame.from_dict(result, orient="index")}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import unittest
+
+from tools.harness_trace import HarnessTracer
+
+MS = 1_000_000
+
+
+class HarnessOverheadTest(unittest.TestCase):
+
+    def test_polls_overlapping_the_startup_are_not_overhead(self):
+        tracer = HarnessTracer()
+        tracer.add('startup', 'app', 'measurement', 0, 1000 * MS)
+        tracer.add('list_namespaced_pod', 'app', 'poll', 100 * MS, 300 * MS)
+        tracer.add('container.logs', 'app', 'poll', 400 * MS, 450 * MS)
+        tracer.add('sleep', 'app', 'sleep', 450 * MS, 950 * MS)
+        self.assertEqual(tracer.overhead('app', 0, 1000 * MS), 0.0)
+
+    def test_critical_path_spans_are_counted_once(self):
+        tracer = HarnessTracer()
+        tracer.add('containers.run', 'app', 'api', 0, 50 * MS)
+        tracer.add('container.logs', 'app', 'poll', 900 * MS, 980 * MS)
+        tracer.add('ready detection', 'app', 'detection', 950 * MS, 1000 * MS)
+        tracer.add('get pod metrics', 'app', 'api', 960 * MS, 970 * MS)
+        self.assertEqual(tracer.overhead('app', 0, 1000 * MS), 100.0)
+
+    def test_spans_are_clipped_to_the_window(self):
+        tracer = HarnessTracer()
+        tracer.add('containers.run', 'app', 'api', 0, 200 * MS)
+        tracer.add('containers.run', 'other', 'api', 100 * MS, 200 * MS)
+        self.assertEqual(tracer.overhead('app', 100 * MS, 1000 * MS), 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
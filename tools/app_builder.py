@@ -2,8 +2,13 @@ import logging
 import subprocess
 import time
 from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
 
+import docker
+from docker.errors import ImageNotFound
+
+from . import dashboard
 from .app_utils import get_image_name
 from .globals import DEFAULT_LOG_FOLDER
 
@@ -15,7 +20,9 @@ def set_verbose():
 
 
 class AppBuilder:
-    def __init__(self):
+    def __init__(self, build_args=None):
+        """build_args are passed to the maven build of the app, e.g. -Dquarkus.native.additional-build-args=..."""
+        self.build_args = build_args if build_args else []
         self.buildAppTime = 0
 
     def build(self):
@@ -25,7 +32,7 @@ class AppBuilder:
         LOGGER.info(f'building {path} app')
         start_time = time.time()
         build_output = open(output_file, 'w+')
-        subprocess.run(["./mvnw", "clean", "package", "-DskipTests", "-pl", path],
+        subprocess.run(["./mvnw", "clean", "package", "-DskipTests", *self.build_args, "-pl", path],
                        check=True,
                        stdout=build_output,
                        stderr=build_output)
@@ -36,6 +43,40 @@ class AppBuilder:
     def build_image(self, path, image_name, output_file):
         pass
 
+    @staticmethod
+    def tag_image(image_name, tag_name):
+        """tags the latest image, so the builds of the same app with different arguments can be kept side by side"""
+        LOGGER.info(f'tagging {image_name} docker image as {tag_name}')
+        docker.from_env().images.get(f'{image_name}:latest').tag(tag_name, 'latest')
+
+    @staticmethod
+    @contextmanager
+    def keep_image(image_name):
+        """restores the latest image after the wrapped builds of its variants, they are only kept by their own tags
+
+        The latest tag points to the image built before, it is removed if there was none.
+        """
+        client = docker.from_env()
+        try:
+            image_id = client.images.get(f'{image_name}:latest').id
+        except ImageNotFound:
+            image_id = None
+        try:
+            yield
+        finally:
+            if image_id:
+                LOGGER.info(f'restoring {image_name} docker image {image_id}')
+                try:
+                    client.images.get(image_id).tag(image_name, 'latest')
+                except ImageNotFound:
+                    LOGGER.warning(f'{image_name} docker image {image_id} cannot be restored, it is removed')
+            else:
+                LOGGER.info(f'removing the {image_name} tag of the variant builds')
+                try:
+                    client.images.remove(f'{image_name}:latest')
+                except ImageNotFound:
+                    pass
+
     @staticmethod
     def to_result_table(app_name, build_app_time, build_image_time):
         table = defaultdict(dict)
@@ -45,8 +86,8 @@ class AppBuilder:
 
 
 class SpringAppBuilder(AppBuilder):
-    def __init__(self, path):
-        super(SpringAppBuilder, self).__init__()
+    def __init__(self, path, build_args=None):
+        super(SpringAppBuilder, self).__init__(build_args)
         self.path = path
         self.app_name = Path(path).stem
         self.output_file = f'{DEFAULT_LOG_FOLDER}/{self.app_name}.out'
@@ -54,9 +95,12 @@ class SpringAppBuilder(AppBuilder):
 
     def build(self):
         image_name = f'{self.app_name}'
+        dashboard.update(image_name, phase='building app', since=time.time(), time=None)
         self.build_app(self.path, self.output_file)
         time.sleep(0.5)
+        dashboard.update(image_name, phase='building image', since=time.time(), time=None)
         self.build_image(self.path, image_name, self.output_file)
+        dashboard.update(image_name, phase='built', time=self.buildAppTime + self.buildImageTime)
         return self.to_result_table(image_name, self.buildAppTime, self.buildImageTime)
 
     def build_image(self, path, image_name, output_file):
@@ -73,8 +117,11 @@ class SpringAppBuilder(AppBuilder):
 
 
 class QuarkusAppBuilder(AppBuilder):
-    def __init__(self, path, build_type='jvm'):
-        super(QuarkusAppBuilder, self).__init__()
+    NATIVE_BUILD_ARGS = ["-Pnative", "-Dquarkus.native.container-build=true",
+                         "-Dquarkus.native.container-runtime=docker"]
+
+    def __init__(self, path, build_type='jvm', build_args=None):
+        super(QuarkusAppBuilder, self).__init__(build_args)
         self.path = path
         self.build_type = build_type
         self.app_name = Path(path).stem
@@ -83,9 +130,12 @@ class QuarkusAppBuilder(AppBuilder):
         self.buildImageTime = 0
 
     def build(self):
+        dashboard.update(self.image_name, phase='building app', since=time.time(), time=None)
         self.build_app(self.path, self.output_file)
         time.sleep(0.5)
+        dashboard.update(self.image_name, phase='building image', since=time.time(), time=None)
         self.build_image(self.path, self.image_name, self.output_file)
+        dashboard.update(self.image_name, phase='built', time=self.buildAppTime + self.buildImageTime)
         return self.to_result_table(self.image_name, self.buildAppTime, self.buildImageTime)
 
     def build_app(self, path, output_file='build.out'):
@@ -98,9 +148,7 @@ class QuarkusAppBuilder(AppBuilder):
         LOGGER.info(f'building {path} app')
         start_time = time.time()
         build_output = open(output_file, 'w+')
-        subprocess.run(["./mvnw", "clean", "package", "-DskipTests",
-                        "-Pnative", "-Dquarkus.native.container-build=true",
-                        "-Dquarkus.native.container-runtime=docker",
+        subprocess.run(["./mvnw", "clean", "package", "-DskipTests", *self.NATIVE_BUILD_ARGS, *self.build_args,
                         "-pl", path],
                        check=True,
                        stdout=build_output,
@@ -0,0 +1,168 @@
+import csv
+import logging
+import time
+from pathlib import Path
+
+from .globals import DEFAULT_RESULT_FOLDER
+from .load_generator import LoadGenerator
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+def interpolate(xs, ys, x):
+    """linear interpolation of the (xs, ys) series at x, the series is flat outside of xs"""
+    if not xs or x <= xs[0]:
+        return ys[0] if ys else 0
+    for i in range(1, len(xs)):
+        if x <= xs[i]:
+            return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - xs[i - 1]) / (xs[i] - xs[i - 1])
+    return ys[-1]
+
+
+class CrossoverAnalysis:
+    """compares a JVM and a native build of the same app under the same load from a cold start
+
+    Every app is started and immediately saturated for the given duration; the timeline is measured from the
+    container start, so the shorter native startup counts. The crossover is the first time when the cumulative
+    requests served by the JVM build overtake the native build. The memory of both builds is then compared at a
+    matched rate: 80% of the lower steady throughput.
+    """
+    MATCHED_RATE_RATIO = 0.8
+
+    def __init__(self, name, jvm_monitor, native_monitor, duration=300, window=5, concurrency=8, matched_duration=60):
+        self.name = name
+        self.monitors = {'jvm': jvm_monitor, 'native': native_monitor}
+        self.duration = duration
+        self.window = window
+        self.concurrency = concurrency
+        self.matched_duration = matched_duration
+        self.timelines = {}
+        self.matchedRate = 0
+        self.matchedMemory = {}
+
+    def run(self):
+        for build_type, monitor in self.monitors.items():
+            monitor.stop()
+            monitor.start()
+            self.timelines[build_type] = self.__saturate(build_type, monitor)
+
+        steady_rps = [self.steady_rps(build_type) for build_type in self.monitors]
+        self.matchedRate = round(min(steady_rps) * self.MATCHED_RATE_RATIO, 1)
+        for build_type, monitor in self.monitors.items():
+            self.matchedMemory[build_type] = self.__matched_memory(build_type, monitor)
+
+        self.save()
+        return self.get_result()
+
+    def __saturate(self, build_type, monitor):
+        LOGGER.info(f'saturating {monitor.container_name} for {self.duration}s')
+        platform_manager = monitor.platformManager
+        generator = LoadGenerator(platform_manager.app_url('/todos'), self.concurrency, name=monitor.container_name)
+        # the timeline starts with the container, the app served nothing until it was ready
+        timeline = [{'time': 0.0, 'requests': 0, 'rps': 0, 'memory': 0},
+                    {'time': monitor.startupTime, 'requests': 0, 'rps': 0, 'memory': monitor.startupMemoryUsage}]
+        generator.start()
+        start_time = time.time()
+        try:
+            while time.time() - start_time < self.duration:
+                time.sleep(self.window)
+                stats = generator.collect()
+                timeline.append({'time': round(monitor.startupTime + time.time() - start_time, 3),
+                                 'requests': timeline[-1]['requests'] + stats['requests'] - stats['errors'],
+                                 'rps': stats['rps'],
+                                 'memory': platform_manager.memory_usage()})
+                LOGGER.debug(f'{build_type}: {timeline[-1]}')
+        finally:
+            generator.stop()
+        return timeline
+
+    def __matched_memory(self, build_type, monitor):
+        LOGGER.info(f'measuring {monitor.container_name} memory at {self.matchedRate} rps')
+        generator = LoadGenerator(monitor.platformManager.app_url('/todos'), self.concurrency, rate=self.matchedRate,
+                                  name=monitor.container_name)
+        samples = []
+        generator.start()
+        try:
+            start_time = time.time()
+            while time.time() - start_time < self.matched_duration:
+                time.sleep(self.window)
+                samples.append(monitor.platformManager.memory_usage())
+        finally:
+            generator.stop()
+        return round(sum(samples) / len(samples), 1) if samples else 0
+
+    def steady_rps(self, build_type):
+        """average throughput of the second half of the saturation"""
+        timeline = self.timelines[build_type][2:]
+        steady = timeline[len(timeline) // 2:]
+        return sum(sample['rps'] for sample in steady) / len(steady) if steady else 0
+
+    def crossover_time(self):
+        """the first time when the cumulative requests of the JVM build overtake the native build"""
+        jvm, native = self.timelines['jvm'], self.timelines['native']
+        native_times = [sample['time'] for sample in native]
+        native_requests = [sample['requests'] for sample in native]
+        end = min(jvm[-1]['time'], native[-1]['time'])
+        for sample in jvm:
+            if 0 < sample['time'] <= end and sample['requests'] and \
+                    sample['requests'] >= interpolate(native_times, native_requests, sample['time']):
+                return sample['time']
+        return None
+
+    def save(self):
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        report_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.name}-crossover.csv'
+        with open(report_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['build-type', 'time', 'requests', 'rps', 'memory'])
+            for build_type, timeline in self.timelines.items():
+                for sample in timeline:
+                    writer.writerow([build_type, sample['time'], sample['requests'], sample['rps'], sample['memory']])
+        LOGGER.info(f'crossover timeline is saved to {report_file}')
+        self.plot()
+
+    def plot(self):
+        try:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+        except ImportError:
+            LOGGER.warning('matplotlib is not installed, the crossover plot is skipped')
+            return
+
+        fig, (requests_axis, memory_axis) = plt.subplots(2, 1, sharex=True, figsize=(10, 8))
+        for build_type, timeline in self.timelines.items():
+            times = [sample['time'] for sample in timeline]
+            requests_axis.plot(times, [sample['requests'] for sample in timeline], label=build_type)
+            memory_axis.plot(times, [sample['memory'] for sample in timeline], label=build_type)
+        crossover = self.crossover_time()
+        if crossover:
+            requests_axis.axvline(crossover, linestyle='--', color='grey')
+        requests_axis.set_ylabel('cumulative requests')
+        requests_axis.set_title(f'{self.name}: jvm vs native')
+        requests_axis.legend()
+        memory_axis.set_ylabel('memory (Mb)')
+        memory_axis.set_xlabel('time since container start (s)')
+        memory_axis.legend()
+        plot_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.name}-crossover.png'
+        fig.savefig(plot_file)
+        plt.close(fig)
+        LOGGER.info(f'crossover plot is saved to {plot_file}')
+
+    def get_result(self):
+        crossover = self.crossover_time()
+        table = {}
+        for build_type in self.monitors:
+            timeline = self.timelines[build_type]
+            table[f'{self.name}-{build_type}'] = {
+                'startup': f'{timeline[1]["time"]}s',
+                'steady-rps': round(self.steady_rps(build_type), 1),
+                'requests': timeline[-1]['requests'],
+                'crossover': f'{crossover}s' if crossover else 'none',
+                'matched-rps': self.matchedRate,
+                'memory-at-matched-rps': f'{self.matchedMemory.get(build_type, 0)}Mb'}
+        return table
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+
+from .load_generator import LoadGenerator
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class EfficiencyTest:
+    """load tests the app and relates the throughput to the CPU-seconds and memory used in the same window
+
+    The CPU window is bounded by the CPU readings themselves (the docker stats call waits for the next sample), the
+    request rate is collected right next to them. A PlatformException is raised if the CPU time of the app cannot be
+    read. The default unit prices are in USD per vCPU-hour and per GiB-hour.
+    """
+    CPU_PRICE = 0.04048
+    MEMORY_PRICE = 0.004445
+
+    def __init__(self, app_name, platform_manager, duration=60, warmup=30, concurrency=8, sample_interval=5,
+                 cpu_price=CPU_PRICE, memory_price=MEMORY_PRICE, rate=None):
+        self.app_name = app_name
+        self.platformManager = platform_manager
+        self.duration = duration
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.rate = rate
+        self.sample_interval = sample_interval
+        self.cpu_price = cpu_price
+        self.memory_price = memory_price
+        self.stats = {}
+        self.cpuSeconds = 0.0
+        self.elapsed = 0.0
+        self.memorySamples = []
+
+    def run(self):
+        generator = LoadGenerator(self.platformManager.app_url('/todos'), concurrency=self.concurrency, rate=self.rate,
+                                  name=self.app_name)
+        generator.start()
+        try:
+            LOGGER.info(f'warming up {self.app_name} for {self.warmup}s')
+            time.sleep(self.warmup)
+            generator.collect()
+
+            LOGGER.info(f'measuring {self.app_name} for {self.duration}s')
+            cpu_start, start_time = self.platformManager.cpu_reading()
+            generator.collect()
+            done = threading.Event()
+            sampler = threading.Thread(target=self.__sample_memory, args=(done,), daemon=True)
+            sampler.start()
+            time.sleep(self.duration)
+            self.stats = generator.collect()
+            cpu_end, end_time = self.platformManager.cpu_reading()
+            self.elapsed = end_time - start_time
+            self.cpuSeconds = cpu_end - cpu_start
+            done.set()
+            sampler.join()
+        finally:
+            generator.stop()
+        return self.get_result()
+
+    def __sample_memory(self, done):
+        while not done.is_set():
+            self.memorySamples.append(self.platformManager.memory_usage())
+            done.wait(self.sample_interval)
+
+    def get_result(self):
+        rps = self.stats.get('rps', 0)
+        cores = self.cpuSeconds / self.elapsed if self.elapsed else 0
+        memory_gib = sum(self.memorySamples) / len(self.memorySamples) / 1024 if self.memorySamples else 0
+        cost_per_hour = cores * self.cpu_price + memory_gib * self.memory_price
+        return {'rps': rps,
+                'p99': f'{self.stats.get("p99", 0)}ms',
+                'cores': round(cores, 3),
+                'memory': f'{round(memory_gib * 1024, 1)}Mb',
+                'rps-per-core': round(rps / cores, 1) if cores else 0,
+                'rps-per-gib': round(rps / memory_gib, 1) if memory_gib else 0,
+                # the request and CPU windows differ by the reading latency, so their rates are related
+                'cpu-ms-per-request': round(cores * 1000 / rps, 3) if rps else 0,
+                'cost-per-million-requests': round(cost_per_hour / (rps * 3600) * 1e6, 4) if rps else 0}
+
+    @staticmethod
+    def rank(results):
+        """orders the app results by the cost per million requests, cheapest first"""
+        ranked = sorted(results.items(), key=lambda item: item[1]['cost-per-million-requests'] or float('inf'))
+        table = {}
+        for rank, (app_name, result) in enumerate(ranked, start=1):
+            table[app_name] = {'rank': rank, **result}
+        return table
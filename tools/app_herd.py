@@ -0,0 +1,104 @@
+import csv
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .app_utils import percentile
+from .globals import DEFAULT_RESULT_FOLDER
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class HerdBenchmark:
+    """cold starts N instances of the same image at the same moment and measures how the startup degrades with N
+
+    Every instance is a separate container (deployment on k8s) with its own monitor thread. The threads stop their
+    leftover instance and then wait on a barrier, so all the start calls are issued at once. The time-to-ready of an
+    instance is measured from the barrier release to its ready log line, so the slower platform calls under
+    contention are counted as well.
+    """
+    PORT_BASE = 9000
+    BARRIER_TIMEOUT = 120
+
+    def __init__(self, app_name, create_monitor, sizes=(1, 2, 4, 8)):
+        """create_monitor(container_name, host_port) returns the monitor of an instance"""
+        self.app_name = app_name
+        self.create_monitor = create_monitor
+        self.sizes = sorted(sizes)
+        self.rounds = {}
+
+    @classmethod
+    def instance_name(cls, app_name, index):
+        return f'{app_name}-herd-{index}'
+
+    def run(self):
+        for size in self.sizes:
+            LOGGER.info(f'cold starting {size} instances of {self.app_name}')
+            self.rounds[size] = self.__run_round(size)
+        self.save()
+        return self.get_result()
+
+    def __run_round(self, size):
+        monitors = [self.create_monitor(self.instance_name(self.app_name, index), self.PORT_BASE + index)
+                    for index in range(size)]
+        release = []
+        barrier = threading.Barrier(size, action=lambda: release.append(time.time()), timeout=self.BARRIER_TIMEOUT)
+        try:
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                futures = [executor.submit(monitor.run, barrier) for monitor in monitors]
+                errors = [future.exception() for future in futures]
+        finally:
+            self.__stop(monitors)
+
+        ready_times = []
+        for monitor, error in zip(monitors, errors):
+            name = monitor.platformManager.container_name
+            if error or monitor.readyTime is None:
+                LOGGER.error(f'{name} did not get ready: {error if error else "timeout"}')
+                ready_times.append(None)
+            else:
+                ready_times.append(round(monitor.readyTime - release[0], 3))
+                LOGGER.debug(f'{name} ready after {ready_times[-1]}s')
+        return ready_times
+
+    @staticmethod
+    def __stop(monitors):
+        with ThreadPoolExecutor(max_workers=len(monitors)) as executor:
+            list(executor.map(lambda monitor: monitor.platformManager.stop_app(), monitors))
+
+    def save(self):
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        report_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.app_name}-herd.csv'
+        with open(report_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['instances', 'instance', 'time-to-ready'])
+            for size, ready_times in self.rounds.items():
+                for index, ready_time in enumerate(ready_times):
+                    writer.writerow([size, index, '' if ready_time is None else ready_time])
+        LOGGER.info(f'herd startup times of {self.app_name} are saved to {report_file}')
+
+    def get_result(self):
+        table = {}
+        baseline = None
+        for size, ready_times in self.rounds.items():
+            ready = sorted(ready_time for ready_time in ready_times if ready_time is not None)
+            p50 = percentile(ready, 50) if ready else None
+            baseline = baseline if baseline else p50
+            table[f'{self.app_name} x{size}'] = {
+                'instances': size,
+                'ready': len(ready),
+                'ready-min': f'{ready[0]}s' if ready else '',
+                'ready-p50': f'{p50}s' if ready else '',
+                'ready-p90': f'{percentile(ready, 90)}s' if ready else '',
+                'ready-max': f'{ready[-1]}s' if ready else '',
+                'ready-stdev': f'{round(statistics.pstdev(ready), 3)}s' if ready else '',
+                'all-ready': f'{ready[-1]}s' if ready and len(ready) == size else '',
+                'p50-slowdown': round(p50 / baseline, 2) if ready and baseline else ''}
+        return table
@@ -1,8 +1,11 @@
 import logging.config
 import re
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 
+from . import dashboard, harness_trace
+from .app_profiler import to_environment
+from .log_matcher import LogMatcher
 from .platform import PlatformManagerFactory
 
 LOGGER = logging.getLogger(__name__)
@@ -12,14 +15,30 @@ def set_verbose():
     LOGGER.setLevel('DEBUG')
 
 
-class AppMonitor:
+class AppMonitorException(Exception):
+    pass
+
 
-    def __init__(self, platform_manager, waiting_message, timeout):
+class AppMonitor:
+    ERROR_PATTERNS = [rb'Error occurred during initialization of VM',
+                      rb'Could not create the Java Virtual Machine',
+                      rb'Unrecognized VM option',
+                      rb'Exception in thread "main"',
+                      rb'java\.lang\.OutOfMemoryError']
+    STACKTRACE_PATTERN = rb'^\s+at \S+\(|^Caused by: '
+    ERROR_CONTEXT_LINES = 30
+
+    def __init__(self, platform_manager, ready_pattern, timeout, profilers=None, error_patterns=None):
         self.platformManager = platform_manager
-        self.message = waiting_message
         self.timeout = timeout
+        self.profilers = profilers if profilers else []
+        self.logMatcher = LogMatcher({'ready': ready_pattern,
+                                      'error': b'|'.join(self.ERROR_PATTERNS + (error_patterns or [])),
+                                      'stacktrace': self.STACKTRACE_PATTERN})
         self.startupTime = 0
+        self.readyTime = None
         self.startupMemoryUsage = 0
+        self.harnessOverhead = 0.0
 
     def start(self):
         pass
@@ -27,46 +46,110 @@ class AppMonitor:
     def stop(self):
         pass
 
-    def run(self):
+    def run(self, start_barrier=None):
+        """start_barrier synchronises the start of several apps, e.g. for the herd benchmark"""
+        app_name = self.platformManager.container_name
         self.platformManager.stop_app()
+        if start_barrier:
+            start_barrier.wait()
+        dashboard.update(app_name, phase='starting', since=time.time(), time=None)
         self.platformManager.start_app()
+        dashboard.watch(app_name, self.platformManager)
         self.__monitor_startup()
 
         LOGGER.info(f'{self.platformManager.container_name} listening on port {self.platformManager.host_port}')
+        dashboard.update(app_name, phase='measuring', time=self.startupTime)
 
         self.__monitor_startup_memory_usage()
 
+        for profiler in self.profilers:
+            profiler.collect(self.platformManager, self.ready_uptime())
+        dashboard.update(app_name, phase='ready')
+
         self.print_startup_result()
         self.print_memory_usage()
 
     def __monitor_startup(self):
+        app_name = self.platformManager.container_name
+        start_ns = time.perf_counter_ns()
         start_time = time.time()
         end_time = start_time
+        end_ns = start_ns
+        # the ready line can only be seen after the last wait for the logs
+        wait_ns = start_ns
+        ready_line = None
+        first_line = True
         attempt = 1
         done = False
-        while not done and attempt < 10:
-            for line in self.platformManager.logs():
-                log_message = str(line, 'utf-8')
-                LOGGER.debug(f'line={log_message}')
-                if self.message in log_message:
+        debug = LOGGER.isEnabledFor(logging.DEBUG)
+        error_context = deque(maxlen=self.ERROR_CONTEXT_LINES)
+        error_lines_left = None
+        while not done and attempt < self.platformManager.MAX_ATTEMPT:
+            for line in LogMatcher.lines(self.platformManager.logs() or []):
+                if first_line:
+                    harness_trace.instant('first log line', app_name)
+                    first_line = False
+                if debug:
+                    LOGGER.debug('line=%s', line)
+                kind = self.logMatcher.match(line)
+                if error_lines_left is not None:
+                    # the fatal error is already detected, only its context is collected
+                    error_context.append(line)
+                    error_lines_left -= 1
+                    if not error_lines_left:
+                        break
+                elif kind == 'ready':
                     end_time = time.time()
-                    self.process_log_message(log_message)
+                    end_ns = time.perf_counter_ns()
+                    self.readyTime = end_time
+                    ready_line = line
+                    harness_trace.instant('ready log line', app_name)
+                    self.process_log_message(line)
                     done = True
                     break
+                elif kind == 'stacktrace':
+                    error_context.append(line)
+                elif kind == 'error':
+                    LOGGER.error(f'{self.platformManager.container_name}: {line.decode(errors="replace")}')
+                    error_context.append(line)
+                    error_lines_left = self.ERROR_CONTEXT_LINES
                 elif time.time() - start_time >= self.timeout:
                     done = True
                     break
+            if error_lines_left is not None:
+                context = b'\n'.join(error_context).decode(errors='replace')
+                raise AppMonitorException(f'{self.platformManager.container_name} failed to start:\n{context}')
             attempt += 1
             if not done:
                 sleeping_time = 1
                 LOGGER.info(f'attempt {attempt}: waiting {sleeping_time} to get the logs of {self.platformManager.container_name}')
-                time.sleep(sleeping_time)
+                wait_ns = time.perf_counter_ns()
+                with harness_trace.span('sleep', app_name, 'sleep'):
+                    time.sleep(sleeping_time)
 
         self.startupTime = round(end_time - start_time, 3)
+        harness_trace.add_span('startup', app_name, 'measurement', start_ns, end_ns)
+        if ready_line is not None and harness_trace.enabled():
+            self.__trace_detection(app_name, ready_line, end_time, end_ns, wait_ns)
+        self.harnessOverhead = harness_trace.overhead(app_name, start_ns, end_ns)
+
+    def __trace_detection(self, app_name, ready_line, end_time, end_ns, wait_ns):
+        """records the detection latency: the part of the last wait for the logs after the app logged it is ready"""
+        logged_time = self.platformManager.log_time(ready_line)
+        if logged_time is None:
+            LOGGER.debug(f'the ready log line of {app_name} has no timestamp, its detection latency is not traced')
+            return
+        # the platform clock may be skewed, the latency is bounded by the last wait
+        latency_ns = min(max(int((end_time - logged_time) * 1e9), 0), end_ns - wait_ns)
+        harness_trace.add_span('ready detection', app_name, 'detection', end_ns - latency_ns, end_ns)
 
     def process_log_message(self, log_message):
+        """extracts the startup metrics from the ready log line (bytes)"""
         pass
 
+    def ready_uptime(self):
+        return self.startupTime
+
     def run_test(self):
         pass
 
@@ -87,24 +170,40 @@ class AppMonitor:
         table[app_name]["startup-memory-usage"] = f'{startup_memory_usage}Mb'
         return table
 
+    def add_profile_result(self, table, app_name):
+        for profiler in self.profilers:
+            table[app_name].update(profiler.get_result())
+        if harness_trace.enabled():
+            table[app_name]['harness-overhead'] = f'{self.harnessOverhead}ms'
+
+        return table
+
 
 class SpringAppMonitor(AppMonitor):
-    APP_STARTUP_PATTERN = re.compile(r'in ([0-9]+[.]?[0-9]*) seconds')
-    JVM_STARTUP_PATTERN = re.compile(r'for ([0-9]+[.]?[0-9]*)')
+    READY_PATTERN = rb'Started \S+ in [0-9]+[.]?[0-9]* seconds'
+    APP_ERROR_PATTERNS = [rb'APPLICATION FAILED TO START', rb'Application run failed']
+    APP_STARTUP_PATTERN = re.compile(rb'in ([0-9]+[.]?[0-9]*) seconds')
+    JVM_STARTUP_PATTERN = re.compile(rb'for ([0-9]+[.]?[0-9]*)')
 
     LOGGER = logging.getLogger(__name__)
 
-    def __init__(self, image_name, container_name, container_port, platform='docker', timeout=120):
-        super().__init__(PlatformManagerFactory.create(platform, image_name, container_name, container_port),
-                         'Started', timeout)
+    def __init__(self, image_name, container_name, container_port, platform='docker', timeout=120, profilers=None,
+                 platform_options=None, environment=None, host_port=None):
+        super().__init__(PlatformManagerFactory.create(platform, image_name, container_name, container_port, host_port,
+                                                       environment=to_environment(profilers or [], environment),
+                                                       **(platform_options or {})),
+                         self.READY_PATTERN, timeout, profilers, self.APP_ERROR_PATTERNS)
         self.image_name = image_name
         self.container_name = container_name
         self.app_startup = ''
         self.jvm_startup = ''
 
     def process_log_message(self, log_message):
-        self.app_startup = re.search(self.APP_STARTUP_PATTERN, log_message).group(1)
-        self.jvm_startup = re.search(self.JVM_STARTUP_PATTERN, log_message).group(1)
+        self.app_startup = re.search(self.APP_STARTUP_PATTERN, log_message).group(1).decode()
+        self.jvm_startup = re.search(self.JVM_STARTUP_PATTERN, log_message).group(1).decode()
+
+    def ready_uptime(self):
+        return float(self.jvm_startup) if self.jvm_startup else self.startupTime
 
     def print_startup_result(self):
         # super().printStartupResult()
@@ -112,23 +211,29 @@ class SpringAppMonitor(AppMonitor):
         LOGGER.info(f'vm-startup: {self.jvm_startup}')
 
     def get_result_table(self, app_name):
-        return super().to_result_table(app_name, self.app_startup, self.jvm_startup, self.startupMemoryUsage)
+        table = super().to_result_table(app_name, self.app_startup, self.jvm_startup, self.startupMemoryUsage)
+        return self.add_profile_result(table, app_name)
 
 
 class QuarkusAppMonitor(AppMonitor):
     LOGGER = logging.getLogger(__name__)
 
-    APP_STARTUP_PATTERN = re.compile(r'in ([0-9]+[.]?[0-9]*)s')
+    READY_PATTERN = rb'started in [0-9]+[.]?[0-9]*s'
+    APP_ERROR_PATTERNS = [rb'Failed to start application']
+    APP_STARTUP_PATTERN = re.compile(rb'in ([0-9]+[.]?[0-9]*)s')
 
-    def __init__(self, image_name, container_name, container_port, host_port, platform='docker', timeout=120):
-        super().__init__(PlatformManagerFactory.create(platform, image_name, container_name, container_port, host_port),
-                         'started in', timeout)
+    def __init__(self, image_name, container_name, container_port, host_port, platform='docker', timeout=120,
+                 profilers=None, platform_options=None, environment=None):
+        super().__init__(PlatformManagerFactory.create(platform, image_name, container_name, container_port, host_port,
+                                                       to_environment(profilers or [], environment),
+                                                       **(platform_options or {})),
+                         self.READY_PATTERN, timeout, profilers, self.APP_ERROR_PATTERNS)
         self.image_name = image_name
         self.container_name = container_name
         self.app_startup = ''
 
     def process_log_message(self, log_message):
-        self.app_startup = re.search(self.APP_STARTUP_PATTERN, log_message).group(1)
+        self.app_startup = re.search(self.APP_STARTUP_PATTERN, log_message).group(1).decode()
 
     def print_startup_result(self):
         # super().printStartupResult()
@@ -136,4 +241,5 @@ class QuarkusAppMonitor(AppMonitor):
         LOGGER.info(f'jvm-startup: {self.startupTime}')
 
     def get_result_table(self, app_name):
-        return super().to_result_table(app_name, self.app_startup, self.startupTime, self.startupMemoryUsage)
+        table = super().to_result_table(app_name, self.app_startup, self.startupTime, self.startupMemoryUsage)
+        return self.add_profile_result(table, app_name)
@@ -0,0 +1,249 @@
+import csv
+import logging
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from .app_utils import bytesto
+from .globals import DEFAULT_RESULT_FOLDER
+from .platform import PlatformException
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+def to_environment(profilers, environment=None):
+    """merges the JVM options of the profilers into one JAVA_TOOL_OPTIONS environment variable"""
+    environment = dict(environment) if environment else {}
+    options = [option for profiler in profilers for option in profiler.java_tool_options()]
+    if options:
+        environment['JAVA_TOOL_OPTIONS'] = ' '.join(options)
+    return environment or None
+
+
+class ProfilerException(Exception):
+    pass
+
+
+class StartupProfiler:
+    """collects the class loading, GC and JIT logs and an optional JFR recording of the JVM startup
+
+    JDK 9+ writes them with unified logging (-Xlog). JDK 8 (Dockerfile.jvm and the jib based spring image) has no
+    unified logging, its -verbose:class, GC and PrintCompilation output is redirected into the same file with
+    LogVMOutput. The JDK 8 class loading lines have no timestamp, they are put on the timeline at the last timestamp
+    logged before them. The log is copied out of the container, so the images need no shell (kubectl cp needs tar on
+    k8s). The JFR recording is dumped with jcmd, it needs a JDK image.
+    """
+    PROFILE_LOG = '/tmp/startup-profile.log'
+    JFR_FILE = '/tmp/startup.jfr'
+    TIMELINE_RESOLUTION = 0.1
+
+    LINE_PATTERN = re.compile(r'^\[([0-9]+[.]?[0-9]*)s\]\[\w+\s*\]\[([\w,]+)\s*\]\s?(.*)$')
+    GC_PAUSE_PATTERN = re.compile(r'GC\(([0-9]+)\) Pause .* ([0-9]+[.]?[0-9]*)ms$')
+    # JDK 8: [Loaded java.lang.Object from ...], "<uptime ms> <compile id> ... Class::method" and
+    # "<uptime s>: [GC (Allocation Failure) ..., <pause> secs]"
+    JDK8_CLASS_LOAD_PATTERN = re.compile(r'^\[Loaded \S+ from ')
+    JDK8_COMPILATION_PATTERN = re.compile(r'^\s*([0-9]+)\s+[0-9]+\s.*::')
+    JDK8_GC_PAUSE_PATTERN = re.compile(r'^([0-9]+[.][0-9]+): \[(?:Full )?GC.*, ([0-9]+[.][0-9]+) secs\]')
+
+    def __init__(self, app_name, jfr=False, java_version=8):
+        self.app_name = app_name
+        self.jfr = jfr
+        self.java_version = java_version
+        self.classesLoaded = 0
+        self.gcCount = 0
+        self.gcPauseTotal = 0.0
+        self.compiledMethods = 0
+        self.timeline = defaultdict(lambda: defaultdict(int))
+
+    def java_tool_options(self):
+        if self.java_version >= 9:
+            options = [f'-Xlog:class+load=info,gc=info,jit+compilation=debug:file={self.PROFILE_LOG}:uptime,level,tags']
+        else:
+            options = ['-XX:+UnlockDiagnosticVMOptions', '-XX:+LogVMOutput', f'-XX:LogFile={self.PROFILE_LOG}',
+                       '-XX:-DisplayVMOutput', '-verbose:class', '-XX:+PrintGCDetails', '-XX:+PrintGCTimeStamps',
+                       '-XX:+PrintCompilation']
+        if self.jfr:
+            options.append('-XX:StartFlightRecording=name=startup,settings=profile')
+        return options
+
+    def collect(self, platform_manager, ready_uptime):
+        LOGGER.info(f'collecting startup profile of {self.app_name}')
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        log_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.app_name}-startup-profile.log'
+        try:
+            platform_manager.copy_from_app(self.PROFILE_LOG, log_file)
+        except PlatformException as e:
+            raise ProfilerException(f'the startup profile of {self.app_name} cannot be collected: {e}') from e
+        with open(log_file, 'r', errors='replace') as f:
+            if self.java_version >= 9:
+                self.parse(f, ready_uptime)
+            else:
+                self.parse_jdk8(f, ready_uptime)
+        if not self.classesLoaded:
+            raise ProfilerException(f'{log_file} of {self.app_name} has no class loading events, '
+                                    f'is {self.app_name} running java {self.java_version}?')
+        self.save_timeline()
+        if self.jfr:
+            self.__collect_jfr(platform_manager)
+
+    def parse(self, lines, ready_uptime):
+        """parses the unified logging output and counts the events which happened before the app was ready"""
+        for line in lines:
+            match = self.LINE_PATTERN.match(line)
+            if not match:
+                continue
+            uptime = float(match.group(1))
+            if ready_uptime and uptime > ready_uptime:
+                continue
+            tags, message = match.group(2), match.group(3)
+            if tags == 'class,load':
+                self.__add_event(uptime, 'classes-loaded')
+            elif tags == 'jit,compilation':
+                self.__add_event(uptime, 'compiled-methods')
+            elif tags == 'gc':
+                gc_pause = self.GC_PAUSE_PATTERN.search(message)
+                if gc_pause:
+                    self.__add_event(uptime, 'gc-count', float(gc_pause.group(2)))
+        self.__log_counts()
+
+    def parse_jdk8(self, lines, ready_uptime):
+        """parses the JDK 8 VM output and counts the events which happened before the app was ready"""
+        uptime = 0.0
+        for line in lines:
+            compilation = self.JDK8_COMPILATION_PATTERN.match(line)
+            gc_pause = self.JDK8_GC_PAUSE_PATTERN.match(line)
+            if compilation:
+                uptime = int(compilation.group(1)) / 1000
+            elif gc_pause:
+                uptime = float(gc_pause.group(1))
+            if ready_uptime and uptime > ready_uptime:
+                break
+            if self.JDK8_CLASS_LOAD_PATTERN.match(line):
+                self.__add_event(uptime, 'classes-loaded')
+            elif compilation and 'made not entrant' not in line and 'made zombie' not in line:
+                self.__add_event(uptime, 'compiled-methods')
+            elif gc_pause:
+                self.__add_event(uptime, 'gc-count', float(gc_pause.group(2)) * 1000)
+        self.__log_counts()
+
+    def __add_event(self, uptime, column, gc_pause=None):
+        bucket = self.timeline[int(uptime / self.TIMELINE_RESOLUTION)]
+        bucket[column] += 1
+        if column == 'classes-loaded':
+            self.classesLoaded += 1
+        elif column == 'compiled-methods':
+            self.compiledMethods += 1
+        else:
+            self.gcCount += 1
+            self.gcPauseTotal += gc_pause
+            bucket['gc-pause'] += gc_pause
+
+    def __log_counts(self):
+        LOGGER.debug(f'{self.app_name}: classes={self.classesLoaded} compiled={self.compiledMethods} '
+                     f'gc={self.gcCount} gc-pause={self.gcPauseTotal}ms')
+
+    def save_timeline(self):
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        timeline_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.app_name}-startup-timeline.csv'
+        columns = ['classes-loaded', 'compiled-methods', 'gc-count', 'gc-pause']
+        with open(timeline_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['uptime'] + columns)
+            total = defaultdict(int)
+            for index in sorted(self.timeline):
+                for column in columns:
+                    total[column] += self.timeline[index][column]
+                writer.writerow([round((index + 1) * self.TIMELINE_RESOLUTION, 3)] +
+                                [round(total[column], 3) for column in columns])
+        LOGGER.info(f'startup timeline of {self.app_name} is saved to {timeline_file}')
+
+    def __collect_jfr(self, platform_manager):
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        jfr_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.app_name}-startup.jfr'
+        try:
+            platform_manager.exec_output(['jcmd', '1', 'JFR.dump', 'name=startup', f'filename={self.JFR_FILE}'])
+            platform_manager.copy_from_app(self.JFR_FILE, jfr_file)
+        except PlatformException as e:
+            raise ProfilerException(f'the JFR recording of {self.app_name} cannot be collected (jcmd needs a JDK '
+                                    f'image): {e}') from e
+        LOGGER.info(f'JFR recording of {self.app_name} is saved to {jfr_file}')
+
+    def get_result(self):
+        return {'classes-loaded': self.classesLoaded,
+                'gc-count': self.gcCount,
+                'gc-pause-total': f'{round(self.gcPauseTotal, 3)}ms',
+                'compiled-methods': self.compiledMethods}
+
+
+class MemoryProfiler:
+    """breaks down the startup memory usage with JVM Native Memory Tracking and /proc/<pid>/smaps_rollup
+
+    The app is expected to run as PID 1 in the container (java or the native binary is exec'd directly). The NMT
+    summary is read with jcmd, which is missing in the JRE images, their NMT columns are skipped with a warning.
+    """
+    APP_PID = 1
+
+    NMT_CATEGORY_PATTERN = re.compile(r'^-\s+([\w ]+?)\s+\(reserved=([0-9]+)KB, committed=([0-9]+)KB\)')
+    SMAPS_PATTERN = re.compile(r'^(\w+):\s+([0-9]+) kB')
+
+    def __init__(self, app_name, jvm=True):
+        self.app_name = app_name
+        self.jvm = jvm
+        self.nmt = {}
+        self.smaps = {}
+        self.nmtAvailable = True
+
+    def java_tool_options(self):
+        return ['-XX:NativeMemoryTracking=summary'] if self.jvm else []
+
+    def collect(self, platform_manager, ready_uptime=None):
+        LOGGER.info(f'collecting memory breakdown of {self.app_name}')
+        if self.jvm:
+            try:
+                self.parse_nmt(platform_manager.exec_output(['jcmd', f'{self.APP_PID}', 'VM.native_memory',
+                                                             'summary']).splitlines())
+            except PlatformException as e:
+                self.nmtAvailable = False
+                LOGGER.warning(f'skipping the NMT columns of {self.app_name}, NMT needs jcmd of a JDK image: {e}')
+        try:
+            self.parse_smaps(platform_manager.app_proc_lines('smaps_rollup'))
+        except PlatformException as e:
+            LOGGER.warning(f'the smaps_rollup of {self.app_name} cannot be read, its RSS columns are empty: {e}')
+
+    def parse_nmt(self, lines):
+        """collects the committed KB per NMT category"""
+        for line in lines:
+            match = self.NMT_CATEGORY_PATTERN.match(line.strip())
+            if match:
+                self.nmt[match.group(1)] = int(match.group(3))
+        LOGGER.debug(f'{self.app_name}: nmt={self.nmt}')
+
+    def parse_smaps(self, lines):
+        for line in lines:
+            match = self.SMAPS_PATTERN.match(line)
+            if match:
+                self.smaps[match.group(1)] = int(match.group(2))
+        LOGGER.debug(f'{self.app_name}: smaps={self.smaps}')
+
+    @staticmethod
+    def __to_mb(kb):
+        return f'{round(bytesto(kb, from_="k"), 1)}Mb' if kb is not None else ''
+
+    def get_result(self):
+        rss = self.smaps.get('Rss')
+        anonymous = self.smaps.get('Anonymous')
+        # JDK 17+ reports metaspace separately, older JDKs account it under Class
+        metaspace = self.nmt.get('Metaspace', self.nmt.get('Class'))
+        result = {'heap': self.__to_mb(self.nmt.get('Java Heap')),
+                  'metaspace': self.__to_mb(metaspace),
+                  'code-cache': self.__to_mb(self.nmt.get('Code')),
+                  'thread-stacks': self.__to_mb(self.nmt.get('Thread'))} if self.nmtAvailable else {}
+        return {**result,
+                'rss': self.__to_mb(rss),
+                'pss': self.__to_mb(self.smaps.get('Pss')),
+                'anonymous': self.__to_mb(anonymous),
+                'file-backed': self.__to_mb(rss - anonymous if rss is not None and anonymous is not None else None)}
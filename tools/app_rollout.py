@@ -0,0 +1,104 @@
+import logging
+import time
+
+from .load_generator import LoadGenerator
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class RolloutBenchmark:
+    """measures how fast the app recovers from rolling restarts and forced pod deletions on kubernetes
+
+    The load runs through the NodePort service for the whole benchmark. A rollout is done when the expected
+    number of new pods are ready, the app is back to steady state when a window has no errors and its p99 is
+    within the tolerance of the p99 measured before the rollout.
+    """
+    SCENARIOS = ['rolling-restart', 'pod-deletion']
+
+    def __init__(self, app_name, platform_manager, replicas=2, iterations=3, concurrency=4, slow_threshold=500,
+                 baseline=10, steady_window=2, steady_tolerance=1.2, timeout=300):
+        self.app_name = app_name
+        self.platformManager = platform_manager
+        self.replicas = replicas
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.slow_threshold = slow_threshold
+        self.baseline = baseline
+        self.steady_window = steady_window
+        self.steady_tolerance = steady_tolerance
+        self.timeout = timeout
+        self.results = []
+
+    def run(self):
+        LOGGER.info(f'scaling {self.app_name} to {self.replicas} replicas')
+        self.platformManager.scale(self.replicas)
+        self.platformManager.wait_for_new_pods(set(), self.replicas, self.timeout)
+
+        generator = LoadGenerator(self.platformManager.app_url('/todos'), self.concurrency,
+                                  slow_threshold=self.slow_threshold, name=self.app_name)
+        generator.start()
+        try:
+            for scenario in self.SCENARIOS:
+                for iteration in range(self.iterations):
+                    LOGGER.info(f'{self.app_name}: {scenario} {iteration + 1}/{self.iterations}')
+                    self.results.append(self.__run_scenario(scenario, generator))
+        finally:
+            generator.stop()
+            self.platformManager.scale(1)
+        return self.get_result()
+
+    def __run_scenario(self, scenario, generator):
+        time.sleep(self.baseline)
+        baseline = generator.collect()
+
+        old_pods = self.platformManager.pod_names()
+        trigger_time = time.time()
+        if scenario == 'rolling-restart':
+            self.platformManager.rollout_restart()
+        else:
+            self.platformManager.delete_pods()
+        rollout_duration = self.platformManager.wait_for_new_pods(old_pods, self.replicas, self.timeout)
+        during = generator.collect()
+        recovery_time = self.__wait_for_steady_state(generator, baseline['p99'], trigger_time)
+
+        result = {'scenario': scenario,
+                  'rollout-duration': rollout_duration,
+                  'failed-requests': during['errors'],
+                  'slow-requests': during['slow'],
+                  'requests': during['requests'],
+                  'recovery-time': recovery_time}
+        LOGGER.debug(f'{self.app_name}: {result}')
+        return result
+
+    def __wait_for_steady_state(self, generator, baseline_p99, trigger_time):
+        target = baseline_p99 * self.steady_tolerance
+        while time.time() - trigger_time < self.timeout:
+            time.sleep(self.steady_window)
+            stats = generator.collect()
+            if stats['requests'] and not stats['errors'] and stats['p99'] <= target:
+                return time.time() - trigger_time
+        LOGGER.error(f'{self.app_name} did not get back to p99 {target}ms within {self.timeout}s')
+        return None
+
+    def get_result(self):
+        table = {}
+        for scenario in self.SCENARIOS:
+            results = [result for result in self.results if result['scenario'] == scenario]
+            if not results:
+                continue
+            durations = [result['rollout-duration'] for result in results]
+            recoveries = [result['recovery-time'] for result in results if result['recovery-time'] is not None]
+            table[f'{self.app_name} {scenario}'] = {
+                'rollout-duration-avg': f'{round(sum(durations) / len(durations), 3)}s',
+                'rollout-duration-max': f'{round(max(durations), 3)}s',
+                'failed-requests': sum(result['failed-requests'] for result in results),
+                'slow-requests': sum(result['slow-requests'] for result in results),
+                'requests': sum(result['requests'] for result in results),
+                'steady-p99-after-avg': f'{round(sum(recoveries) / len(recoveries), 3)}s' if recoveries else '',
+                'steady-p99-after-max': f'{round(max(recoveries), 3)}s' if recoveries else '',
+                'not-recovered': len(results) - len(recoveries)}
+        return table
@@ -0,0 +1,144 @@
+import logging
+import os
+import queue
+import statistics
+import subprocess
+import threading
+import time
+
+import docker
+from docker.errors import DockerException, ImageNotFound
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+def parse_resource_limits(resource_limits):
+    """parses memory:cpus strings, e.g. 512m:1 or 1g (no cpu limit)"""
+    limits = []
+    for resource_limit in resource_limits or []:
+        memory, _, cpus = resource_limit.partition(':')
+        limits.append({'memory': memory or None, 'cpus': cpus or None})
+    return limits or [None]
+
+
+class ShardedRunner:
+    """spreads the benchmark matrix over several docker hosts with a work queue
+
+    Every host runs one job at a time. The startup times are normalised with a per-host calibration run
+    (a fixed CPU bound shell loop in a container) relative to the fastest host.
+    """
+    CALIBRATION_IMAGE = 'infra-db:1.0.0'
+    CALIBRATION_COMMAND = 'i=0; while [ $i -lt 300000 ]; do i=$((i+1)); done'
+    CALIBRATION_RUNS = 3
+    NORMALISED_COLUMNS = ['app-startup', 'jvm-startup']
+
+    def __init__(self, docker_hosts, jobs, create_monitor, before_job=None):
+        """jobs are (app_name, resources, iteration) tuples, create_monitor(app_name, platform_options) returns
+        the app monitor of a job, before_job(docker_host) is called before every job on that host"""
+        self.docker_hosts = docker_hosts
+        self.jobs = jobs
+        self.create_monitor = create_monitor
+        self.before_job = before_job
+        self.calibration = {}
+        self.results = []
+        self.__lock = threading.Lock()
+
+    def setup(self, image_names):
+        for docker_host in self.docker_hosts:
+            LOGGER.info(f'starting the infrastructure on {docker_host}')
+            subprocess.run(['./infra.py', '-p', 'docker', 'start'], check=True,
+                           env=dict(os.environ, DOCKER_HOST=docker_host))
+            self.distribute_images(docker_host, image_names)
+
+    @staticmethod
+    def distribute_images(docker_host, image_names):
+        """copies the local images to the host unless it has the same image ID (save and load keep the ID), so a stale
+        image with the same tag is replaced"""
+        local_client = docker.from_env()
+        remote_client = docker.DockerClient(base_url=docker_host)
+        for image_name in image_names:
+            local_image = local_client.images.get(image_name)
+            try:
+                remote_id = remote_client.images.get(image_name).id
+            except ImageNotFound:
+                remote_id = None
+            if remote_id == local_image.id:
+                LOGGER.debug(f'{docker_host} has the same {image_name} image ({local_image.short_id[7:]})')
+                continue
+            if remote_id:
+                LOGGER.info(f'{image_name} image of {docker_host} is stale ({remote_id[7:19]}), replacing it with '
+                            f'{local_image.short_id[7:]}')
+            else:
+                LOGGER.info(f'copying {image_name} image to {docker_host}')
+            remote_client.images.load(b''.join(local_image.save()))
+            remote_id = remote_client.images.get(image_name).id
+            if remote_id != local_image.id:
+                raise DockerException(f'{image_name} image of {docker_host} is {remote_id} after the copy, expected '
+                                      f'{local_image.id}')
+
+    def calibrate(self):
+        for docker_host in self.docker_hosts:
+            client = docker.DockerClient(base_url=docker_host)
+            durations = []
+            for _ in range(self.CALIBRATION_RUNS):
+                start_time = time.time()
+                client.containers.run(self.CALIBRATION_IMAGE, [self.CALIBRATION_COMMAND], entrypoint=['sh', '-c'],
+                                      remove=True)
+                durations.append(time.time() - start_time)
+            self.calibration[docker_host] = statistics.median(durations)
+            LOGGER.info(f'calibration of {docker_host}: {round(self.calibration[docker_host], 3)}s')
+        return self.calibration
+
+    def run(self):
+        jobs = queue.Queue()
+        for job in self.jobs:
+            jobs.put(job)
+        workers = [threading.Thread(target=self.__work, args=(docker_host, jobs)) for docker_host in self.docker_hosts]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self.merge()
+
+    def __work(self, docker_host, jobs):
+        while True:
+            try:
+                app_name, resources, iteration = jobs.get_nowait()
+            except queue.Empty:
+                return
+            LOGGER.info(f'{docker_host}: running {app_name} #{iteration + 1} with {resources}')
+            monitor = self.create_monitor(app_name, {'docker_host': docker_host, 'resources': resources})
+            try:
+                if self.before_job:
+                    self.before_job(docker_host)
+                result = monitor.start()[app_name]
+            except Exception as e:
+                LOGGER.error(f'{docker_host}: {app_name} #{iteration + 1} failed: {e}')
+                result = {'error': str(e)}
+            finally:
+                monitor.stop()
+            with self.__lock:
+                self.results.append((app_name, resources, iteration, docker_host, dict(result)))
+
+    def merge(self):
+        """merges the job results into one table tagged with the host and the normalised startup times"""
+        fastest = min(self.calibration.values()) if self.calibration else None
+        table = {}
+        results = sorted(self.results, key=lambda r: (r[0], str(r[1]), r[2]))
+        for app_name, resources, iteration, docker_host, result in results:
+            limits = f' {resources["memory"] or "-"}/{resources["cpus"] or "-"}' if resources else ''
+            row = {'host': docker_host, **result}
+            if fastest and docker_host in self.calibration:
+                factor = self.calibration[docker_host] / fastest
+                row['host-factor'] = round(factor, 3)
+                for column in self.NORMALISED_COLUMNS:
+                    try:
+                        row[f'{column}-normalised'] = round(float(result[column]) / factor, 3)
+                    except (KeyError, TypeError, ValueError):
+                        pass
+            table[f'{app_name}{limits} #{iteration + 1}'] = row
+        return table
@@ -0,0 +1,131 @@
+import csv
+import logging
+import time
+from pathlib import Path
+
+from .app_utils import linear_trend
+from .globals import DEFAULT_RESULT_FOLDER
+from .load_generator import LoadGenerator
+from .platform import PlatformException
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class SoakTest:
+    """drives a steady /todos workload for hours and detects memory leaks, latency and GC overhead drift
+
+    Every sample is appended to a csv time series, the drifts are the slopes of the least-squares trend lines
+    fitted after the warmup period. The GC time is read with jstat, which needs a JDK image. Without it the GC
+    overhead check is reported as unavailable, it is not passed.
+    """
+    COLUMNS = ['elapsed', 'memory', 'rps', 'p50', 'p99', 'errors', 'gc-time']
+    WARMUP_RATIO = 0.1
+
+    def __init__(self, app_name, platform_manager, jvm=True, duration=1.0, interval=60, rate=20,
+                 max_memory_drift=10.0, max_latency_drift=5.0, max_gc_overhead_drift=0.5):
+        self.app_name = app_name
+        self.platformManager = platform_manager
+        self.jvm = jvm
+        self.duration = duration * 3600
+        self.interval = interval
+        self.rate = rate
+        self.max_memory_drift = max_memory_drift
+        self.max_latency_drift = max_latency_drift
+        self.max_gc_overhead_drift = max_gc_overhead_drift
+        self.series_file = Path(DEFAULT_RESULT_FOLDER) / f'{app_name}-soak.csv'
+        self.samples = []
+        self.memoryDrift = 0.0
+        self.latencyDrift = 0.0
+        self.gcOverheadDrift = None
+        self.gcAvailable = jvm
+        self.failures = []
+
+    def run(self):
+        LOGGER.info(f'soaking {self.app_name} for {round(self.duration / 3600, 2)}h')
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        generator = LoadGenerator(self.platformManager.app_url('/todos'), rate=self.rate, name=self.app_name)
+        generator.start()
+        start_time = time.time()
+        try:
+            with open(self.series_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.COLUMNS)
+                while time.time() - start_time < self.duration:
+                    time.sleep(self.interval)
+                    sample = self.__sample(generator, time.time() - start_time)
+                    writer.writerow([sample[column] for column in self.COLUMNS])
+                    f.flush()
+        finally:
+            generator.stop()
+        LOGGER.info(f'soak time series of {self.app_name} is saved to {self.series_file}')
+        self.analyze()
+        return not self.failures
+
+    def __sample(self, generator, elapsed):
+        stats = generator.collect()
+        sample = {'elapsed': round(elapsed, 1),
+                  'memory': self.platformManager.memory_usage(),
+                  'rps': stats['rps'],
+                  'p50': stats['p50'],
+                  'p99': stats['p99'],
+                  'errors': stats['errors'],
+                  'gc-time': self.__gc_time() if self.gcAvailable else ''}
+        LOGGER.debug(f'{self.app_name}: {sample}')
+        self.samples.append(sample)
+        return sample
+
+    def __gc_time(self):
+        """total GC time in seconds (GCT column of jstat -gcutil)"""
+        try:
+            output = self.platformManager.exec_output(['jstat', '-gcutil', '1'])
+            lines = [line.split() for line in output.splitlines() if line.strip()]
+            return float(dict(zip(lines[0], lines[-1]))['GCT'])
+        except PlatformException as e:
+            # the JRE images have no jstat, it is not retried
+            self.gcAvailable = False
+            LOGGER.warning(f'the GC overhead check of {self.app_name} is unavailable, jstat needs a JDK image: {e}')
+        except (IndexError, KeyError, ValueError):
+            LOGGER.warning(f'unexpected jstat output of {self.app_name}')
+        return ''
+
+    def analyze(self):
+        warmup = self.duration * self.WARMUP_RATIO
+        samples = [sample for sample in self.samples if sample['elapsed'] >= warmup]
+        hours = [sample['elapsed'] / 3600 for sample in samples]
+        self.memoryDrift, _ = linear_trend(hours, [sample['memory'] for sample in samples])
+        self.latencyDrift, _ = linear_trend(hours, [sample['p99'] for sample in samples])
+
+        gc_samples = [sample for sample in samples if sample['gc-time'] != '']
+        overheads = [(current['gc-time'] - previous['gc-time']) / (current['elapsed'] - previous['elapsed']) * 100
+                     for previous, current in zip(gc_samples, gc_samples[1:])]
+        # the trend needs two overhead points at least
+        if self.gcAvailable and len(overheads) >= 2:
+            self.gcOverheadDrift, _ = linear_trend([sample['elapsed'] / 3600 for sample in gc_samples[1:]],
+                                                   overheads)
+        elif self.gcAvailable:
+            LOGGER.warning(f'{self.app_name}: not enough GC time samples, the GC overhead check is unavailable')
+
+        if self.memoryDrift > self.max_memory_drift:
+            self.failures.append(f'memory grows {round(self.memoryDrift, 2)}Mb/h')
+        if self.latencyDrift > self.max_latency_drift:
+            self.failures.append(f'p99 latency grows {round(self.latencyDrift, 2)}ms/h')
+        if self.gcOverheadDrift is not None and self.gcOverheadDrift > self.max_gc_overhead_drift:
+            self.failures.append(f'GC overhead grows {round(self.gcOverheadDrift, 2)}%/h')
+        for failure in self.failures:
+            LOGGER.error(f'{self.app_name}: {failure}')
+
+    def get_result(self):
+        gc_unavailable = self.jvm and self.gcOverheadDrift is None
+        if self.failures:
+            soak_result = 'failed'
+        else:
+            soak_result = 'passed, gc check unavailable' if gc_unavailable else 'passed'
+        return {'memory-drift': f'{round(self.memoryDrift, 2)}Mb/h',
+                'p99-drift': f'{round(self.latencyDrift, 2)}ms/h',
+                'gc-overhead-drift': 'unavailable' if gc_unavailable else
+                f'{round(self.gcOverheadDrift, 2)}%/h' if self.jvm else '',
+                'soak-result': soak_result}
@@ -1,3 +1,6 @@
+import math
+import re
+from datetime import datetime
 from pathlib import Path
 
 
@@ -46,3 +49,34 @@ def read_dot_env_file(env_file):
             (key, val) = line.split('=')
             d[key] = val.rstrip()
     return d
+
+
+def percentile(sorted_values, p):
+    """nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def linear_trend(xs, ys):
+    """least-squares fit of y = slope * x + intercept, returns (slope, intercept)"""
+    n = len(xs)
+    if n < 2:
+        return 0.0, ys[0] if ys else 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if not var_x:
+        return 0.0, mean_y
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    return slope, mean_y - slope * mean_x
+
+
+def parse_timestamp(timestamp):
+    """epoch seconds of an RFC 3339 timestamp of docker or k8s, the fraction is truncated to microseconds"""
+    match = re.match(r'^([0-9-]+T[0-9:]+)(?:[.]([0-9]+))?(Z|[+-][0-9:]+)$', timestamp.strip())
+    if not match:
+        raise ValueError(f'{timestamp} is not an RFC 3339 timestamp')
+    zone = '+00:00' if match.group(3) == 'Z' else match.group(3)
+    return datetime.fromisoformat(f'{match.group(1)}.{(match.group(2) or "0")[:6].ljust(6, "0")}{zone}').timestamp()
@@ -0,0 +1,176 @@
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+LOGGER = logging.getLogger(__name__)
+
+_DASHBOARD = None
+
+
+def start(refresh=0.5):
+    """starts the live dashboard, the console log handler is muted to warnings while it runs"""
+    global _DASHBOARD
+    if not _DASHBOARD:
+        _DASHBOARD = Dashboard(refresh)
+        _DASHBOARD.start()
+
+
+def stop():
+    global _DASHBOARD
+    if _DASHBOARD:
+        _DASHBOARD.stop()
+        _DASHBOARD = None
+
+
+def echo(text):
+    """prints the text, or holds it back until the dashboard is stopped so the redraws do not wipe it"""
+    if _DASHBOARD:
+        _DASHBOARD.reports.append(text)
+    else:
+        print(text)
+
+
+def update(app_name, **fields):
+    if _DASHBOARD:
+        _DASHBOARD.update(app_name, **fields)
+
+
+def watch(app_name, platform_manager):
+    if _DASHBOARD:
+        _DASHBOARD.watch(app_name, platform_manager)
+
+
+def attach(app_name, generator):
+    if _DASHBOARD:
+        _DASHBOARD.attach(app_name, generator)
+
+
+def detach(app_name):
+    if _DASHBOARD:
+        _DASHBOARD.detach(app_name)
+
+
+class Dashboard:
+    """renders the phase, resource usage and load statistics of every app at a fixed rate
+
+    The measuring threads only put values into the shared state, all the formatting and the writing to the
+    terminal happens in the render thread. The stats stream of every started app is read by its own thread.
+    """
+    SPARKS = '▁▂▃▄▅▆▇█'
+    HISTORY = 30
+
+    def __init__(self, refresh=0.5, stream=sys.stdout):
+        self.refresh = refresh
+        self.stream = stream
+        self.apps = defaultdict(dict)
+        self.memory = defaultdict(lambda: deque(maxlen=self.HISTORY))
+        self.cpu = defaultdict(lambda: deque(maxlen=self.HISTORY))
+        self.generators = {}
+        # the stop event of the stats watcher of every app, a restarted app replaces its watcher
+        self.watchers = {}
+        self.reports = []
+        self.start_time = time.time()
+        self.__lock = threading.Lock()
+        self.__running = threading.Event()
+        self.__renderer = None
+        self.__muted_handlers = []
+
+    def start(self):
+        self.__mute_console()
+        self.__running.set()
+        self.__renderer = threading.Thread(target=self.__render_loop, daemon=True)
+        self.__renderer.start()
+
+    def stop(self):
+        self.__running.clear()
+        if self.__renderer:
+            self.__renderer.join()
+        self.__unmute_console()
+        self.stream.write('\x1b[H\x1b[2J' + self.render() + '\n\n')
+        for report in self.reports:
+            self.stream.write(f'{report}\n')
+        self.stream.flush()
+
+    def update(self, app_name, **fields):
+        with self.__lock:
+            self.apps[app_name].update(fields)
+
+    def attach(self, app_name, generator):
+        self.generators[app_name] = generator
+        self.update(app_name, phase='load test')
+
+    def detach(self, app_name):
+        self.generators.pop(app_name, None)
+
+    def watch(self, app_name, platform_manager):
+        stopped = threading.Event()
+        with self.__lock:
+            previous = self.watchers.get(app_name)
+            if previous:
+                previous.set()
+            self.watchers[app_name] = stopped
+        threading.Thread(target=self.__watch_stats, args=(app_name, platform_manager, stopped), daemon=True).start()
+
+    def __watch_stats(self, app_name, platform_manager, stopped):
+        try:
+            for memory, cpu in platform_manager.stats_stream():
+                if not self.__running.is_set() or stopped.is_set():
+                    break
+                self.memory[app_name].append(memory)
+                self.cpu[app_name].append(cpu)
+        except Exception as e:
+            LOGGER.debug(f'stats stream of {app_name} is closed: {e}')
+
+    def __mute_console(self):
+        loggers = [logging.getLogger()] + [logger for logger in logging.root.manager.loggerDict.values()
+                                           if isinstance(logger, logging.Logger)]
+        for logger in loggers:
+            for handler in logger.handlers:
+                if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler) and \
+                        handler.level < logging.WARNING:
+                    self.__muted_handlers.append((handler, handler.level))
+                    handler.setLevel(logging.WARNING)
+
+    def __unmute_console(self):
+        for handler, level in self.__muted_handlers:
+            handler.setLevel(level)
+        self.__muted_handlers = []
+
+    def __render_loop(self):
+        while self.__running.is_set():
+            self.stream.write('\x1b[H\x1b[2J' + self.render() + '\n')
+            self.stream.flush()
+            time.sleep(self.refresh)
+
+    @classmethod
+    def sparkline(cls, values):
+        values = [value for value in values if value is not None]
+        if not values:
+            return ''
+        low, high = min(values), max(values)
+        scale = (high - low) or 1
+        return ''.join(cls.SPARKS[int((value - low) / scale * (len(cls.SPARKS) - 1))] for value in values)
+
+    def render(self):
+        with self.__lock:
+            apps = {app_name: dict(fields) for app_name, fields in self.apps.items()}
+        now = time.time()
+        lines = [f'elapsed {round(now - self.start_time)}s',
+                 f'{"app":<26} {"phase":<16} {"time":>8}  {"memory":<{self.HISTORY + 10}} {"cpu":<{self.HISTORY + 8}}'
+                 f' {"rps":>8} {"p50":>8} {"p99":>8}']
+        for app_name, fields in apps.items():
+            phase_time = fields.get('time')
+            if phase_time is None and fields.get('since'):
+                phase_time = round(now - fields['since'], 1)
+            memory, cpu = list(self.memory[app_name]), list(self.cpu[app_name])
+            memory_text = f'{round(memory[-1])}Mb {self.sparkline(memory)}' if memory else ''
+            cpu_text = f'{round(cpu[-1])}% {self.sparkline(cpu)}' if cpu else ''
+            generator = self.generators.get(app_name)
+            load = generator.peek() if generator else {}
+            phase_time = phase_time if phase_time is not None else ''
+            lines.append(f'{app_name:<26} {fields.get("phase", ""):<16} {phase_time:>8}'
+                         f'  {memory_text:<{self.HISTORY + 10}} {cpu_text:<{self.HISTORY + 8}}'
+                         f' {load.get("rps", ""):>8} {load.get("p50", ""):>8} {load.get("p99", ""):>8}')
+        return '\n'.join(lines)
@@ -1,5 +1,8 @@
+import os
+
 ENV_FILE = '.env'
 DEFAULT_LOG_FOLDER = '.logs'
+DEFAULT_RESULT_FOLDER = '.results'
 DATABASES = ['spring_todo', 'quarkus_todo', 'micronaut_todo']
 DATABASE_HOST = 'infra-db'
 
@@ -9,3 +12,5 @@ DOCKER_TODO_APP_NETWORK = 'todo_app_network'
 # kubernetes
 TODO_APP_NAMESPACE = 'todo-app-ns'
 INFRA_DB_CONFIG = 'infra-db-config'
+# node address of the NodePort services, e.g. $(minikube ip) or a kind node with extraPortMappings
+K8S_NODE_HOST = os.environ.get('K8S_NODE_HOST', 'localhost')
@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .globals import DEFAULT_RESULT_FOLDER
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+# the app keeps starting while the harness polls its logs and pods or sleeps in between (poll and sleep spans), only
+# the platform calls the app waits for (e.g. creating its container) and the latency of detecting the ready log line
+# (the part of the last poll interval after it was logged) are on the critical path of the startup
+OVERHEAD_CATEGORIES = {'api', 'detection'}
+
+_TRACER = None
+
+
+def enable():
+    global _TRACER
+    if not _TRACER:
+        _TRACER = HarnessTracer()
+
+
+def enabled():
+    return _TRACER is not None
+
+
+@contextmanager
+def span(name, app=None, category='api', **args):
+    """records the wall time of the wrapped harness step with perf_counter_ns, a no-op while tracing is disabled"""
+    if not _TRACER:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _TRACER.add(name, app, category, start, time.perf_counter_ns(), args)
+
+
+def add_span(name, app, category, start, end, **args):
+    """records a span measured by the caller with perf_counter_ns"""
+    if _TRACER:
+        _TRACER.add(name, app, category, start, end, args)
+
+
+def instant(name, app=None, category='event', **args):
+    if _TRACER:
+        now = time.perf_counter_ns()
+        _TRACER.add(name, app, category, now, now, args)
+
+
+def overhead(app, start, end):
+    """milliseconds of the [start, end] perf_counter_ns window spent in the harness of the app"""
+    return _TRACER.overhead(app, start, end) if _TRACER else 0.0
+
+
+def save(file_name='harness-trace.json'):
+    return _TRACER.save(Path(DEFAULT_RESULT_FOLDER) / file_name) if _TRACER else None
+
+
+class HarnessTracer:
+    """collects the spans of the harness steps (platform API calls, log reads, sleeps)
+
+    The spans are exported in the Chrome trace event format, they can be opened in chrome://tracing or Perfetto.
+    Every app gets its own track. The harness overhead of a measurement window is the union of the critical path
+    spans (OVERHEAD_CATEGORIES) of the app recorded by the measuring thread within the window, so nested spans are
+    counted once and the polls and the background samplers (e.g. the dashboard) are left out.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.__lock = threading.Lock()
+
+    def add(self, name, app, category, start, end, args=None):
+        with self.__lock:
+            self.spans.append((name, app, category, start, end, threading.get_ident(), args or {}))
+
+    def overhead(self, app, start, end):
+        thread = threading.get_ident()
+        with self.__lock:
+            intervals = sorted((max(span_start, start), min(span_end, end))
+                               for _, span_app, category, span_start, span_end, span_thread, _ in self.spans
+                               if span_app == app and span_thread == thread and category in OVERHEAD_CATEGORIES and
+                               span_start < end and span_end > start)
+        total = 0
+        current_start, current_end = None, None
+        for interval_start, interval_end in intervals:
+            if current_end is None or interval_start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = interval_start, interval_end
+            else:
+                current_end = max(current_end, interval_end)
+        if current_end is not None:
+            total += current_end - current_start
+        return round(total / 1e6, 3)
+
+    def to_chrome_trace(self):
+        with self.__lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        tracks = {}
+        events = []
+        for name, app, category, start, end, _, args in spans:
+            tid = tracks.setdefault(app or 'harness', len(tracks) + 1)
+            event = {'name': name, 'cat': category, 'pid': pid, 'tid': tid, 'ts': start / 1000, 'args': args}
+            if end > start:
+                event.update({'ph': 'X', 'dur': (end - start) / 1000})
+            else:
+                event.update({'ph': 'i', 's': 't'})
+            events.append(event)
+        for track, tid in tracks.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': track}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, trace_file):
+        Path(trace_file).parent.mkdir(exist_ok=True)
+        with open(trace_file, 'w') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        LOGGER.info(f'harness trace is saved to {trace_file}')
+        return trace_file
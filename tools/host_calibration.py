@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import docker
+from kubernetes import client as k8s_client, config as k8s_config
+
+from .globals import DEFAULT_RESULT_FOLDER
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class HostCalibration:
+    """fingerprints the host and runs a fixed CPU, memory and disk micro-benchmark before the measurements
+
+    The host is noisy when the run-to-run variation of a micro-benchmark or the load average per CPU is above
+    the limits. With a baseline file of an earlier calibration the startup times are normalised by the CPU
+    score relative to that baseline.
+    """
+    CALIBRATION_FILE = 'host-calibration.json'
+    NORMALISED_COLUMNS = ['app-startup', 'jvm-startup']
+
+    def __init__(self, runs=5, max_variation=0.1, max_load=0.5, baseline_file=None):
+        self.runs = runs
+        self.max_variation = max_variation
+        self.max_load = max_load
+        self.baseline_file = baseline_file
+        self.fingerprint = {}
+        self.scores = {}
+        self.variations = {}
+        self.factor = None
+
+    def calibrate(self):
+        LOGGER.info('calibrating the host')
+        self.fingerprint = self.collect_fingerprint()
+        for name, benchmark in [('cpu', self.__cpu_benchmark), ('memory', self.__memory_benchmark),
+                                ('disk', self.__disk_benchmark)]:
+            durations = []
+            for _ in range(self.runs):
+                start_time = time.perf_counter()
+                benchmark()
+                durations.append(time.perf_counter() - start_time)
+            self.scores[name] = round(statistics.median(durations), 4)
+            self.variations[name] = round(statistics.stdev(durations) / statistics.mean(durations), 4) \
+                if len(durations) > 1 else 0.0
+        if self.baseline_file and Path(self.baseline_file).is_file():
+            baseline = json.loads(Path(self.baseline_file).read_text())
+            self.factor = round(self.scores['cpu'] / baseline['scores']['cpu'], 4)
+        LOGGER.info(f'calibration scores={self.scores} variations={self.variations} factor={self.factor}')
+        if self.is_noisy():
+            LOGGER.warning(f'the host is too noisy for valid startup comparisons: {self.noise_reasons()}')
+        self.save()
+        return self
+
+    @staticmethod
+    def collect_fingerprint():
+        governor_file = '/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor'
+        fingerprint = {'cpu-model': platform.processor() or platform.machine(),
+                       'cpu-count': os.cpu_count(),
+                       'governor': HostCalibration.__read_file(governor_file),
+                       'load-average': os.getloadavg()[0] if hasattr(os, 'getloadavg') else None,
+                       'cgroup-version': 'v2' if Path('/sys/fs/cgroup/cgroup.controllers').is_file() else 'v1',
+                       'kernel': platform.release(),
+                       'docker-version': None,
+                       'k8s-version': None}
+        for line in (HostCalibration.__read_file('/proc/cpuinfo') or '').splitlines():
+            if line.startswith('model name'):
+                fingerprint['cpu-model'] = line.split(':', 1)[1].strip()
+                break
+        try:
+            fingerprint['docker-version'] = docker.from_env().version()['Version']
+        except Exception as e:
+            LOGGER.debug(f'docker version is not available: {e}')
+        try:
+            k8s_config.load_kube_config()
+            fingerprint['k8s-version'] = k8s_client.VersionApi().get_code().git_version
+        except Exception as e:
+            LOGGER.debug(f'kubernetes version is not available: {e}')
+        return fingerprint
+
+    @staticmethod
+    def __read_file(path):
+        try:
+            return Path(path).read_text().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def __cpu_benchmark():
+        digest = b''
+        for _ in range(200000):
+            digest = hashlib.sha256(digest).digest()
+
+    @staticmethod
+    def __memory_benchmark():
+        buffer = bytearray(64 * 1024 * 1024)
+        for _ in range(4):
+            buffer = bytearray(buffer)
+
+    @staticmethod
+    def __disk_benchmark():
+        block = os.urandom(1024 * 1024)
+        with tempfile.NamedTemporaryFile(dir='.') as f:
+            for _ in range(32):
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            while f.read(1024 * 1024):
+                pass
+
+    @staticmethod
+    def drop_page_caches():
+        """drops the page cache of the host, needs root (or the sudoers entry for the sysctl)"""
+        subprocess.run(['sync'], check=False)
+        try:
+            Path('/proc/sys/vm/drop_caches').write_text('3\n')
+            LOGGER.debug('page caches are dropped')
+        except OSError as e:
+            LOGGER.warning(f'page caches cannot be dropped: {e}')
+
+    def noise_reasons(self):
+        reasons = [f'{name} variation {variation}' for name, variation in self.variations.items()
+                   if variation > self.max_variation]
+        load = self.fingerprint.get('load-average')
+        if load is not None and load / (self.fingerprint.get('cpu-count') or 1) > self.max_load:
+            reasons.append(f'load average {load}')
+        return reasons
+
+    def is_noisy(self):
+        return bool(self.noise_reasons())
+
+    def save(self):
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        calibration_file = Path(DEFAULT_RESULT_FOLDER) / self.CALIBRATION_FILE
+        calibration_file.write_text(json.dumps({'fingerprint': self.fingerprint, 'scores': self.scores,
+                                                'variations': self.variations, 'factor': self.factor}, indent=2))
+        LOGGER.info(f'host calibration is saved to {calibration_file}')
+
+    def annotate(self, table):
+        """flags the app results with the host noise and adds the normalised startup times"""
+        for app_name in table:
+            table[app_name]['host-noise'] = 'noisy' if self.is_noisy() else 'ok'
+            if self.factor:
+                table[app_name]['host-factor'] = self.factor
+                for column in self.NORMALISED_COLUMNS:
+                    try:
+                        normalised = float(table[app_name][column]) / self.factor
+                        table[app_name][f'{column}-normalised'] = round(normalised, 3)
+                    except (KeyError, TypeError, ValueError):
+                        pass
+        return table
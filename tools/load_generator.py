@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+from . import dashboard
+from .app_utils import percentile
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class LoadGenerator:
+    """drives a steady GET workload against the app with a fixed number of worker threads
+
+    The collected latencies can be read window by window with collect(), the totals are kept until stop().
+    peek() reads the last seconds from a bounded buffer without touching the window, e.g. for the dashboard.
+    """
+    RECENT_SIZE = 5000
+    RECENT_PERIOD = 2
+
+    def __init__(self, url, concurrency=4, rate=None, timeout=5, slow_threshold=None, name=None):
+        self.url = url
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold
+        self.totalRequests = 0
+        self.totalErrors = 0
+        self.__latencies = []
+        self.__recent = deque(maxlen=self.RECENT_SIZE)
+        self.__errors = 0
+        self.__window_start = 0
+        self.__lock = threading.Lock()
+        self.__running = threading.Event()
+        self.__workers = []
+
+    def start(self):
+        LOGGER.info(f'starting load on {self.url} with {self.concurrency} workers')
+        self.__running.set()
+        self.__window_start = time.time()
+        self.__workers = [threading.Thread(target=self.__work, daemon=True) for _ in range(self.concurrency)]
+        for worker in self.__workers:
+            worker.start()
+        if self.name:
+            dashboard.attach(self.name, self)
+
+    def stop(self):
+        self.__running.clear()
+        for worker in self.__workers:
+            worker.join()
+        self.__workers = []
+        if self.name:
+            dashboard.detach(self.name)
+        LOGGER.info(f'load on {self.url} is stopped after {self.totalRequests} requests ({self.totalErrors} errors)')
+
+    def collect(self):
+        """returns the statistics of the requests since the last call and starts a new window"""
+        with self.__lock:
+            latencies, errors = self.__latencies, self.__errors
+            self.__latencies, self.__errors = [], 0
+            now = time.time()
+            elapsed, self.__window_start = now - self.__window_start, now
+        return self.to_stats(sorted(latencies), errors, elapsed, self.slow_threshold)
+
+    def peek(self):
+        """returns the statistics of the last RECENT_PERIOD seconds"""
+        since = time.time() - self.RECENT_PERIOD
+        latencies = sorted(latency for timestamp, latency in list(self.__recent) if timestamp >= since)
+        return self.to_stats(latencies, 0, self.RECENT_PERIOD)
+
+    @staticmethod
+    def to_stats(latencies, errors, elapsed, slow_threshold=None):
+        requests = len(latencies) + errors
+        return {'requests': requests,
+                'errors': errors,
+                'slow': len([latency for latency in latencies if latency > slow_threshold]) if slow_threshold else 0,
+                'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99)}
+
+    def __work(self):
+        pause = self.concurrency / self.rate if self.rate else 0
+        while self.__running.is_set():
+            start_time = time.perf_counter()
+            try:
+                with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+                    response.read()
+                latency = round((time.perf_counter() - start_time) * 1000, 3)
+                self.__recent.append((time.time(), latency))
+                with self.__lock:
+                    self.__latencies.append(latency)
+                    self.totalRequests += 1
+            except (urllib.error.URLError, IOError) as e:
+                LOGGER.debug(f'request to {self.url} failed: {e}')
+                with self.__lock:
+                    self.__errors += 1
+                    self.totalRequests += 1
+                    self.totalErrors += 1
+            if pause:
+                time.sleep(max(0.0, pause - (time.perf_counter() - start_time)))
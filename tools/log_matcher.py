@@ -0,0 +1,32 @@
+import re
+
+
+class LogMatcher:
+    """classifies raw log lines with one combined compiled pattern
+
+    Every line is scanned once, as bytes, against the alternation of all patterns. Only the rare matching
+    lines are decoded or run through the detailed extraction patterns of the monitors.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.pattern = re.compile(b'|'.join(b'(?P<%s>%s)' % (kind.encode(), pattern)
+                                            for kind, pattern in patterns.items()))
+
+    def match(self, line):
+        """returns the kind of the first pattern matching the line or None"""
+        match = self.pattern.search(line)
+        return match.lastgroup if match else None
+
+    @staticmethod
+    def lines(chunks):
+        """splits a stream of byte chunks into lines, a chunk may hold several or only a part of a line"""
+        rest = b''
+        for chunk in chunks:
+            if rest:
+                chunk = rest + chunk
+            lines = chunk.split(b'\n')
+            rest = lines.pop()
+            yield from lines
+        if rest:
+            yield rest
@@ -0,0 +1,262 @@
+import csv
+import itertools
+import logging
+import platform
+import re
+import subprocess
+import time
+from pathlib import Path
+
+import docker
+from docker.errors import DockerException
+
+from .app_builder import QuarkusAppBuilder
+from .app_efficiency import EfficiencyTest
+from .app_monitor import QuarkusAppMonitor, AppMonitorException
+from .app_profiler import MemoryProfiler
+from .app_utils import bytesto, get_image_name
+from .globals import DEFAULT_RESULT_FOLDER
+from .load_generator import LoadGenerator
+from .platform import PlatformException
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class NativeSweepException(Exception):
+    pass
+
+
+def native_variants(gcs=None, optimizations=None, marchs=None, pgo=False):
+    """the cartesian product of the native-image options, None keeps the default of native-image"""
+    variants = []
+    for gc, optimization, march, use_pgo in itertools.product(gcs or [None], optimizations or [None],
+                                                              marchs or [None], [False, True] if pgo else [False]):
+        parts = [f'gc-{gc}' if gc else '', f'o{optimization}' if optimization else '',
+                 f'march-{march}' if march else '', 'pgo' if use_pgo else '']
+        variants.append({'name': '-'.join(part for part in parts if part) or 'default',
+                         'gc': gc, 'optimization': optimization, 'march': march, 'pgo': use_pgo})
+    return variants
+
+
+class NativeBuildSweep:
+    """builds a quarkus app with a matrix of native-image options and benchmarks every variant
+
+    Every variant is built with its own -Dquarkus.native.additional-build-args and tagged as {image}-{variant}. The
+    PGO variants are built twice: an instrumented build is trained with the /todos workload, its profile is written
+    into the .results/pgo folder (mounted into the app and the builder containers) and the final build is optimised
+    with it. Every variant is then started for the startup time and RSS and load tested for the throughput, next to
+    its build time, binary size and image size.
+
+    The options need a recent GraalVM or Mandrel builder image (G1, PGO and -O3 need Oracle GraalVM), see
+    builder_image. The native-image version of the builder is checked before the builds, the sweep fails on the
+    options it does not support. A variant which fails to build is reported and skipped. The base image is restored
+    at the end, the variants are only kept by their own tags.
+    """
+    GCS = ['serial', 'G1']
+    PGO_FOLDER = Path(DEFAULT_RESULT_FOLDER) / 'pgo'
+    PGO_MOUNT = '/pgo'
+    # the builder image of quarkus 1.2.0.Final, which knows none of the swept options
+    DEFAULT_BUILDER_IMAGE = 'quay.io/quarkus/ubi-quarkus-native-image:19.3.1-java8'
+    # the first GraalVM release of the swept native-image options
+    OPTION_VERSIONS = {'gc': (21, 0), 'optimization': (22, 2), 'quick-build': (22, 3), 'march': (23, 0),
+                       'pgo': (21, 0)}
+    # native-image --version prints the GraalVM release differently in the GraalVM, Mandrel and JDK based versions
+    VERSION_PATTERNS = [re.compile(r'jvmci-([0-9]+)\.([0-9]+)'), re.compile(r'Mandrel-([0-9]+)\.([0-9]+)'),
+                        re.compile(r'GraalVM (?:Version )?([0-9]+)\.([0-9]+)'),
+                        re.compile(r'native-image ([0-9]+)\.([0-9]+)')]
+
+    def __init__(self, path, variants, builder_image=None, host_port=8092, container_port=8091, training=60,
+                 duration=60, warmup=30, concurrency=8):
+        self.path = path
+        self.app_name = Path(path).stem
+        self.base_image = get_image_name(path, 'native')
+        self.variants = self.available(variants)
+        self.builder_image = builder_image
+        self.host_port = host_port
+        self.container_port = container_port
+        self.training = training
+        self.duration = duration
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.results = {}
+
+    @staticmethod
+    def available(variants):
+        """the G1 GC of native images is supported on linux amd64 only"""
+        if platform.machine().lower() in ('x86_64', 'amd64'):
+            return variants
+        skipped = [variant['name'] for variant in variants if variant['gc'] == 'G1']
+        if skipped:
+            LOGGER.warning(f'G1 is not available on {platform.machine()}, skipping {", ".join(skipped)}')
+        return [variant for variant in variants if variant['gc'] != 'G1']
+
+    def image_name(self, variant, instrumented=False):
+        return f'{self.base_image}-{variant["name"]}{"-instrumented" if instrumented else ""}'
+
+    def profile_file(self, variant):
+        return f'{variant["name"]}.iprof'
+
+    def build_args(self, variant, instrumented=False):
+        native_image_args = []
+        if variant['gc']:
+            native_image_args.append(f'--gc={variant["gc"]}')
+        if variant['optimization']:
+            native_image_args.append(f'-O{variant["optimization"]}')
+        if variant['march']:
+            native_image_args.append(f'-march={variant["march"]}')
+        if variant['pgo'] and instrumented:
+            native_image_args += ['--pgo-instrument',
+                                  f'-R:ProfilesDumpFile={self.PGO_MOUNT}/{self.profile_file(variant)}']
+        elif variant['pgo']:
+            native_image_args.append(f'--pgo={self.PGO_MOUNT}/{self.profile_file(variant)}')
+
+        args = []
+        if native_image_args:
+            args.append(f'-Dquarkus.native.additional-build-args={",".join(native_image_args)}')
+        if variant['pgo']:
+            args.append(f'-Dquarkus.native.container-runtime-options=--volume={self.PGO_FOLDER.resolve()}:'
+                        f'{self.PGO_MOUNT}:z')
+        if self.builder_image:
+            args.append(f'-Dquarkus.native.builder-image={self.builder_image}')
+        return args
+
+    def run(self):
+        self.check_builder()
+        with QuarkusAppBuilder.keep_image(self.base_image):
+            for variant in self.variants:
+                LOGGER.info(f'sweeping {self.app_name} native variant {variant["name"]}')
+                try:
+                    if variant['pgo']:
+                        self.train(variant)
+                    result = self.build(variant)
+                except (subprocess.CalledProcessError, AppMonitorException, PlatformException) as e:
+                    LOGGER.error(f'{variant["name"]} variant failed to build: {e}')
+                    self.results[variant['name']] = {'result': 'build failed'}
+                    continue
+                try:
+                    result.update(self.benchmark(variant))
+                except (AppMonitorException, PlatformException) as e:
+                    LOGGER.error(f'{variant["name"]} variant failed to start: {e}')
+                    result['result'] = 'startup failed'
+                self.results[variant['name']] = result
+        self.save()
+        return self.get_result()
+
+    @classmethod
+    def graalvm_version(cls, version_output):
+        """((major, minor), oracle) of the GraalVM release printed by native-image --version"""
+        for pattern in cls.VERSION_PATTERNS:
+            match = pattern.search(version_output)
+            if match:
+                oracle = 'Oracle GraalVM' in version_output or re.search(r'\bEE\b', version_output) is not None
+                return (int(match.group(1)), int(match.group(2))), oracle
+        raise NativeSweepException(f'unknown native-image version: {version_output.strip()}')
+
+    @classmethod
+    def requirements(cls, variant):
+        """(option, first GraalVM release, Oracle GraalVM only) of the options of the variant"""
+        if variant['gc']:
+            yield f'--gc={variant["gc"]}', cls.OPTION_VERSIONS['gc'], variant['gc'] == 'G1'
+        if variant['optimization']:
+            min_version = cls.OPTION_VERSIONS['quick-build' if variant['optimization'] == 'b' else 'optimization']
+            yield f'-O{variant["optimization"]}', min_version, variant['optimization'] == '3'
+        if variant['march']:
+            yield f'-march={variant["march"]}', cls.OPTION_VERSIONS['march'], False
+        if variant['pgo']:
+            yield '--pgo', cls.OPTION_VERSIONS['pgo'], True
+
+    def check_builder(self):
+        """fails on the options the native-image of the builder image does not support, before any build"""
+        image = self.builder_image or self.DEFAULT_BUILDER_IMAGE
+        try:
+            output = docker.from_env().containers.run(image, ['--version'], entrypoint='native-image', remove=True)
+        except DockerException as e:
+            raise NativeSweepException(f'the native-image version of {image} cannot be read: {e}')
+        version, oracle = self.graalvm_version(output.decode(errors='replace'))
+        builder = f'{image} (GraalVM {version[0]}.{version[1]}{" Oracle" if oracle else ""})'
+        LOGGER.info(f'native images are built with {builder}')
+        unsupported = []
+        for variant in self.variants:
+            for option, min_version, oracle_only in self.requirements(variant):
+                if version < min_version:
+                    unsupported.append(f'{variant["name"]}: {option} needs GraalVM {min_version[0]}.{min_version[1]}+')
+                elif oracle_only and not oracle:
+                    unsupported.append(f'{variant["name"]}: {option} needs Oracle GraalVM')
+        if unsupported:
+            raise NativeSweepException(f'{builder} does not support the options of the variants, set a recent '
+                                       f'--builder-image:\n' + '\n'.join(dict.fromkeys(unsupported)))
+
+    def build(self, variant, instrumented=False):
+        builder = QuarkusAppBuilder(self.path, 'native', self.build_args(variant, instrumented))
+        builder.build()
+        binary_size = sum(binary.stat().st_size for binary in (Path(self.path) / 'target').glob('*-runner'))
+        image_name = self.image_name(variant, instrumented)
+        builder.tag_image(self.base_image, image_name)
+        image_size = docker.from_env().images.get(f'{image_name}:latest').attrs['Size']
+        return {'build-time': f'{round(builder.buildAppTime + builder.buildImageTime, 3)}s',
+                'binary-size': f'{round(bytesto(binary_size), 1)}Mb',
+                'image-size': f'{round(bytesto(image_size), 1)}Mb'}
+
+    def train(self, variant):
+        """builds the instrumented image and records a profile with the /todos workload"""
+        self.PGO_FOLDER.mkdir(parents=True, exist_ok=True)
+        # the app runs as a non-root user in the container
+        self.PGO_FOLDER.chmod(0o777)
+        self.build(variant, instrumented=True)
+        monitor = self.create_monitor(self.image_name(variant, instrumented=True), volumes={
+            str(self.PGO_FOLDER.resolve()): {'bind': self.PGO_MOUNT, 'mode': 'rw'}})
+        monitor.run()
+        LOGGER.info(f'training {self.image_name(variant, instrumented=True)} for {self.training}s')
+        generator = LoadGenerator(monitor.platformManager.app_url('/todos'), self.concurrency,
+                                  name=monitor.container_name)
+        generator.start()
+        try:
+            time.sleep(self.training)
+        finally:
+            generator.stop()
+            # the profile is dumped when the app exits
+            monitor.platformManager.stop_app()
+        profile = self.PGO_FOLDER / self.profile_file(variant)
+        if not profile.is_file():
+            raise PlatformException(f'{profile} is not written by the instrumented app')
+        LOGGER.info(f'{profile} is recorded')
+
+    def benchmark(self, variant):
+        image_name = self.image_name(variant)
+        monitor = self.create_monitor(image_name, profilers=[MemoryProfiler(image_name, jvm=False)])
+        try:
+            monitor.run()
+            result = {'app-startup': f'{monitor.app_startup}s',
+                      'startup': f'{monitor.startupTime}s',
+                      'rss': monitor.profilers[0].get_result()['rss']}
+            test = EfficiencyTest(image_name, monitor.platformManager, self.duration, self.warmup, self.concurrency)
+            efficiency = test.run()
+            result.update({'rps': efficiency['rps'], 'p99': efficiency['p99'],
+                           'cpu-ms-per-request': efficiency['cpu-ms-per-request']})
+        finally:
+            monitor.platformManager.stop_app()
+        return result
+
+    def create_monitor(self, image_name, profilers=None, volumes=None):
+        return QuarkusAppMonitor(image_name=f'{image_name}:latest', container_name=image_name,
+                                 container_port=self.container_port, host_port=self.host_port,
+                                 profilers=profilers, platform_options={'volumes': volumes} if volumes else None)
+
+    def save(self):
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        report_file = Path(DEFAULT_RESULT_FOLDER) / f'{self.base_image}-sweep.csv'
+        table = self.get_result()
+        columns = list(dict.fromkeys(column for result in table.values() for column in result))
+        with open(report_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['variant', *columns])
+            for name, result in table.items():
+                writer.writerow([name, *(result.get(column, '') for column in columns)])
+        LOGGER.info(f'native build sweep of {self.app_name} is saved to {report_file}')
+
+    def get_result(self):
+        return {f'{self.base_image}-{name}': result for name, result in self.results.items()}
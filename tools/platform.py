@@ -1,16 +1,25 @@
 import json
 import logging.config
 import re
+import subprocess
+import tarfile
 import time
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
 
 import docker
-from docker.errors import NotFound
+from docker.errors import APIError, NotFound
 from kubernetes import client as k8s_client, config as k8s_config
 from kubernetes.client import V1LabelSelector, V1ObjectMeta, V1DeploymentSpec, V1PodTemplateSpec, V1PodSpec, \
-    V1Container, V1ContainerPort, V1EnvFromSource, V1ConfigMapEnvSource, V1Deployment, V1ServicePort
+    V1Container, V1ContainerPort, V1EnvFromSource, V1ConfigMapEnvSource, V1Deployment, V1ServicePort, V1EnvVar, \
+    V1Namespace, V1ConfigMap, V1ResourceQuota, V1ResourceQuotaSpec, V1ResourceRequirements
 from kubernetes.client.rest import ApiException
+from kubernetes.stream import stream as k8s_stream
+from kubernetes.stream.ws_client import ERROR_CHANNEL
 
-from .app_utils import bytesto
+from .app_utils import bytesto, parse_timestamp
+from .harness_trace import span
 from .globals import *
 
 LOGGER = logging.getLogger(__name__)
@@ -36,115 +45,374 @@ class PlatformManager:
     def memory_usage(self):
         pass
 
+    def cpu_time(self):
+        """cumulative CPU seconds of the app, raises PlatformException if they cannot be read"""
+        pass
+
+    def cpu_reading(self):
+        """(cumulative CPU seconds, epoch seconds when they were read), so the CPU window matches the wall clock"""
+        cpu = self.cpu_time()
+        return cpu, time.time()
+
     def logs(self):
         pass
 
+    def log_time(self, line):
+        """epoch seconds the platform logged the line (bytes) at, None if they are unknown"""
+        return None
+
+    @staticmethod
+    def find_log_time(timestamped_logs, line):
+        """epoch seconds of the first occurrence of the line in logs prefixed with RFC 3339 timestamps"""
+        for timestamped_line in timestamped_logs.split(b'\n'):
+            timestamp, _, logged_line = timestamped_line.partition(b' ')
+            if logged_line.rstrip(b'\r') == line.rstrip(b'\r'):
+                try:
+                    return parse_timestamp(timestamp.decode())
+                except ValueError:
+                    return None
+        return None
+
+    def app_url(self, path=''):
+        pass
+
+    def exec_output(self, command):
+        """runs the command in the app container and returns its output, raises PlatformException if it fails
+
+        The images may have no shell or coreutils (e.g. distroless), so a missing command is an error, not an empty
+        output.
+        """
+        pass
+
+    def copy_from_app(self, path, dest):
+        """copies a file out of the app container, raises PlatformException if it fails"""
+        pass
+
+    def app_proc_lines(self, name):
+        """the lines of /proc/<pid>/<name> of the app, which runs as PID 1 in the container"""
+        return self.exec_output(['cat', f'/proc/1/{name}']).splitlines()
+
+    def stats_stream(self, interval=2):
+        """yields (memory Mb, cpu %) samples of the app by polling memory_usage and cpu_time"""
+        last_cpu, last_time = self.cpu_time(), time.time()
+        while True:
+            time.sleep(interval)
+            cpu, now = self.cpu_time(), time.time()
+            yield self.memory_usage(), round((cpu - last_cpu) / (now - last_time) * 100, 1)
+            last_cpu, last_time = cpu, now
+
+    def cgroup_cpu_time(self):
+        """cumulative CPU seconds of the app container read from the cgroup v2 or v1 accounting file
+
+        It needs cat in the image, a PlatformException is raised instead of reporting 0 (e.g. on distroless).
+        """
+        try:
+            output = self.exec_output(['cat', '/sys/fs/cgroup/cpu.stat'])
+        except PlatformException as e:
+            LOGGER.debug(f'no cgroup v2 cpu.stat: {e}')
+        else:
+            for line in output.splitlines():
+                if line.startswith('usage_usec'):
+                    return int(line.split()[1]) / 1e6
+        output = self.exec_output(['cat', '/sys/fs/cgroup/cpuacct/cpuacct.usage'])
+        if output.strip().isdigit():
+            return int(output) / 1e9
+        raise PlatformException(f'unexpected cpuacct.usage of {self.container_name}: {output.strip()}')
+
 
 class DockerPlatformManager(PlatformManager):
 
-    def __init__(self, image_name, container_name, container_port, host_port=None):
+    def __init__(self, image_name, container_name, container_port, host_port=None, environment=None,
+                 docker_host=None, resources=None, max_attempts=None, volumes=None):
         self.image_name = image_name
         self.container_name = container_name
         self.container_port = container_port
         self.host_port = host_port if host_port else container_port
-        self.client = docker.from_env()
+        self.environment = environment if environment else {}
+        self.docker_host = docker_host
+        self.resources = resources if resources else {}
+        self.volumes = volumes if volumes else {}
+        self.MAX_ATTEMPT = max_attempts if max_attempts else self.MAX_ATTEMPT
+        self.client = docker.DockerClient(base_url=docker_host) if docker_host else docker.from_env()
         self.container = None
 
     def stop_app(self):
         try:
-            container = self.client.containers.get(self.container_name)
+            with span('containers.get', self.container_name):
+                container = self.client.containers.get(self.container_name)
             LOGGER.warning(f'{self.container_name} container is running')
-            container.stop()
+            with span('container.stop', self.container_name):
+                container.stop()
             LOGGER.info(f'{self.container_name} container is stopped')
-            time.sleep(0.5)
+            with span('sleep', self.container_name, 'sleep'):
+                time.sleep(0.5)
         except NotFound:
             LOGGER.info(f'{self.container_name} is not running')
 
     def start_app(self):
         LOGGER.info(f'Starting {self.image_name} container ...')
-        self.container = self.client.containers.run(self.image_name,
-                                                    name=f'{self.container_name}',
-                                                    detach=True,
-                                                    remove=True,
-                                                    network='todo_app_network',
-                                                    ports={f'{self.container_port}/tcp': self.host_port},
-                                                    environment=["POSTGRES_DB_HOST=infra-db"])
+        limits = {}
+        if self.resources.get('memory'):
+            limits['mem_limit'] = self.resources['memory']
+        if self.resources.get('cpus'):
+            limits['nano_cpus'] = int(float(self.resources['cpus']) * 1e9)
+        environment = {'POSTGRES_DB_HOST': DATABASE_HOST, **self.environment}
+        with span('containers.run', self.container_name):
+            self.container = self.client.containers.run(self.image_name,
+                                                        name=f'{self.container_name}',
+                                                        detach=True,
+                                                        remove=True,
+                                                        network=DOCKER_TODO_APP_NETWORK,
+                                                        ports={f'{self.container_port}/tcp': self.host_port},
+                                                        environment=[f'{k}={v}' for k, v in environment.items()],
+                                                        volumes=self.volumes,
+                                                        **limits)
 
     def memory_usage(self):
         # container = self.client.containers.get(self.container_name)
         if not self.container:
             return 0
-        stats = self.container.stats(stream=False)
+        with span('container.stats', self.container_name):
+            stats = self.container.stats(stream=False)
         return round(bytesto(stats["memory_stats"]["usage"]), 1)
 
+    def cpu_time(self):
+        return self.cpu_reading()[0]
+
+    def cpu_reading(self):
+        # the stats call waits for the next sample, its read timestamp is when the usage was sampled
+        if not self.container:
+            raise PlatformException(f'{self.container_name} container is not running')
+        with span('container.stats', self.container_name):
+            stats = self.container.stats(stream=False)
+        return stats["cpu_stats"]["cpu_usage"]["total_usage"] / 1e9, parse_timestamp(stats['read'])
+
+    def stats_stream(self, interval=None):
+        """yields (memory Mb, cpu %) samples from the docker stats stream (about one per second)"""
+        if not self.container:
+            return
+        for stats in self.container.stats(stream=True, decode=True):
+            cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - \
+                stats['precpu_stats'].get('cpu_usage', {}).get('total_usage', 0)
+            system_delta = stats['cpu_stats'].get('system_cpu_usage', 0) - \
+                stats['precpu_stats'].get('system_cpu_usage', 0)
+            online_cpus = stats['cpu_stats'].get('online_cpus', 1)
+            cpu = round(cpu_delta / system_delta * online_cpus * 100, 1) if system_delta > 0 else 0.0
+            yield round(bytesto(stats['memory_stats'].get('usage', 0)), 1), cpu
+
     def logs(self):
         if not self.container:
             return None
-        return self.container.logs(stream=True)
+        with span('container.logs', self.container_name, 'poll'):
+            return self.container.logs(stream=True)
+
+    def log_time(self, line):
+        if not self.container:
+            return None
+        try:
+            with span('container.logs', self.container_name, timestamps=True):
+                timestamped_logs = self.container.logs(timestamps=True)
+        except APIError as e:
+            LOGGER.debug(f'no log timestamps of {self.container_name}: {e}')
+            return None
+        return self.find_log_time(timestamped_logs, line)
+
+    def app_url(self, path=''):
+        return f'http://localhost:{self.host_port}{path}'
+
+    def exec_output(self, command):
+        if not self.container:
+            raise PlatformException(f'{self.container_name} container is not running')
+        try:
+            with span('container.exec_run', self.container_name, command=' '.join(command)):
+                exit_code, output = self.container.exec_run(command)
+        except APIError as e:
+            raise PlatformException(f'{" ".join(command)} failed in {self.container_name}: {e.explanation}') from e
+        output = str(output, 'utf-8', errors='replace')
+        if exit_code != 0:
+            raise PlatformException(f'{" ".join(command)} failed in {self.container_name} with exit code '
+                                    f'{exit_code}: {output.strip()}')
+        return output
+
+    def copy_from_app(self, path, dest):
+        if not self.container:
+            raise PlatformException(f'{self.container_name} container is not running')
+        try:
+            with span('container.get_archive', self.container_name):
+                bits, _ = self.container.get_archive(path)
+                data = b''.join(bits)
+        except APIError as e:
+            raise PlatformException(f'{path} cannot be copied from {self.container_name}: {e.explanation}') from e
+        with tarfile.open(fileobj=BytesIO(data)) as tar:
+            member = tar.getmembers()[0]
+            Path(dest).write_bytes(tar.extractfile(member).read())
+        return dest
+
+    def app_proc_lines(self, name):
+        """reads the /proc file of the app process from the host if the docker daemon is local (the image may have
+        no cat), falls back to reading it in the container
+
+        The daemon may run in a VM or another PID namespace (Docker Desktop, rootless dockerd, DOCKER_HOST), so the
+        host process is only read if its cgroup belongs to the container.
+        """
+        if not self.container:
+            raise PlatformException(f'{self.container_name} container is not running')
+        if not self.docker_host:
+            with span('container.reload', self.container_name):
+                self.container.reload()
+            proc = Path(f'/proc/{self.container.attrs["State"]["Pid"]}')
+            try:
+                if self.container.id in (proc / 'cgroup').read_text():
+                    return (proc / name).read_text().splitlines()
+                LOGGER.debug(f'{proc} is not the process of {self.container_name} on this host')
+            except OSError as e:
+                LOGGER.debug(f'{name} of {self.container_name} cannot be read from the host: {e}')
+        return super().app_proc_lines(name)
 
 
 class KubernetesPlatformManager(PlatformManager):
     MEMORY_USAGE_PATTERN = re.compile(r'([0-9]+)([a-zA-Z]+)')
-
-    def __init__(self, image_name, container_name, container_port, host_port=None):
+    NODE_PORT_OFFSET = 22000
+    # every object of the apps gets this label, so all of them can be torn down with one label selector
+    BENCHMARK_LABELS = {'benchmark': 'todo-app'}
+    BENCHMARK_SELECTOR = 'benchmark=todo-app'
+    EXEC_TIMEOUT = 60
+
+    def __init__(self, image_name, container_name, container_port, host_port=None, environment=None,
+                 own_namespace=False, quota=None, replicas=1, max_attempts=None):
+        """own_namespace deploys the app into its own namespace, limited by the quota ({'memory', 'cpus'}) if set"""
         self.image_name = image_name
         self.container_name = container_name
         self.container_port = container_port
         self.host_port = host_port if host_port else container_port
+        self.environment = environment if environment else {}
+        self.namespace = self.app_namespace(container_name) if own_namespace else TODO_APP_NAMESPACE
+        self.quota = quota if quota else {}
+        self.replicas = replicas
+        self.MAX_ATTEMPT = max_attempts if max_attempts else self.MAX_ATTEMPT
+        if self.namespace != TODO_APP_NAMESPACE:
+            # the database service stays in the shared namespace, a bare service name is qualified with it
+            database_host = self.environment.get('POSTGRES_DB_HOST', DATABASE_HOST)
+            if '.' not in database_host:
+                database_host = f'{database_host}.{TODO_APP_NAMESPACE}'
+            self.environment = {**self.environment, 'POSTGRES_DB_HOST': database_host}
         k8s_config.load_kube_config()
         self.appsApi = k8s_client.AppsV1Api()
         self.coreApi = k8s_client.CoreV1Api()
         self.apiClient = k8s_client.ApiClient()
 
+    @staticmethod
+    def app_namespace(container_name):
+        return f'{TODO_APP_NAMESPACE}-{container_name}'
+
     def start_app(self):
+        if self.namespace != TODO_APP_NAMESPACE:
+            self.__prepare_namespace()
         labels = {'app': self.container_name}
         self.__create_app_deployment(labels)
         self.__create_app_service(labels)
 
+    def __prepare_namespace(self):
+        """creates the namespace of the app with the database config map and the resource quota"""
+        with span('list_namespace', self.container_name):
+            namespaces = self.coreApi.list_namespace(field_selector=f'metadata.name={self.namespace}')
+        if not namespaces.items:
+            LOGGER.info(f'creating {self.namespace} namespace')
+            metadata = V1ObjectMeta(name=self.namespace, labels=self.BENCHMARK_LABELS)
+            with span('create_namespace', self.container_name):
+                self.coreApi.create_namespace(body=V1Namespace(metadata=metadata))
+
+        with span('list_namespaced_config_map', self.container_name):
+            config_maps = self.coreApi.list_namespaced_config_map(namespace=self.namespace,
+                                                                  field_selector=f'metadata.name={INFRA_DB_CONFIG}')
+        if not config_maps.items:
+            with span('read_namespaced_config_map', self.container_name):
+                config_map = self.coreApi.read_namespaced_config_map(name=INFRA_DB_CONFIG,
+                                                                     namespace=TODO_APP_NAMESPACE)
+            with span('create_namespaced_config_map', self.container_name):
+                self.coreApi.create_namespaced_config_map(
+                    namespace=self.namespace,
+                    body=V1ConfigMap(metadata=V1ObjectMeta(name=INFRA_DB_CONFIG), data=config_map.data))
+
+        if self.quota:
+            quota = V1ResourceQuota(metadata=V1ObjectMeta(name=self.container_name, labels=self.BENCHMARK_LABELS),
+                                    spec=V1ResourceQuotaSpec(hard={**self.__quota_resources('requests'),
+                                                                   **self.__quota_resources('limits')}))
+            with span('delete_collection_namespaced_resource_quota', self.container_name):
+                self.coreApi.delete_collection_namespaced_resource_quota(namespace=self.namespace,
+                                                                         label_selector=self.BENCHMARK_SELECTOR)
+            with span('create_namespaced_resource_quota', self.container_name):
+                self.coreApi.create_namespaced_resource_quota(namespace=self.namespace, body=quota)
+
+    def __quota_resources(self, prefix=None):
+        resources = {}
+        if self.quota.get('memory'):
+            resources[f'{prefix}.memory' if prefix else 'memory'] = self.quota['memory']
+        if self.quota.get('cpus'):
+            resources[f'{prefix}.cpu' if prefix else 'cpu'] = self.quota['cpus']
+        return resources
+
     def __create_app_deployment(self, labels):
         container_port = V1ContainerPort(container_port=self.container_port)
         config_map_ref = V1ConfigMapEnvSource(name=INFRA_DB_CONFIG)
         container = V1Container(name=self.container_name, image=self.image_name, image_pull_policy='IfNotPresent',
-                                ports=[container_port], env_from=[V1EnvFromSource(config_map_ref=config_map_ref)])
+                                ports=[container_port], env_from=[V1EnvFromSource(config_map_ref=config_map_ref)],
+                                env=[V1EnvVar(name=k, value=v) for k, v in self.environment.items()] or None)
+        if self.quota:
+            # a namespace with a quota only admits pods with requests and limits
+            container.resources = V1ResourceRequirements(requests=self.__quota_resources(),
+                                                         limits=self.__quota_resources())
         pod_spec = V1PodSpec(containers=[container])
-        pod_temp_spec = V1PodTemplateSpec(metadata=V1ObjectMeta(name=self.container_name, labels=labels), spec=pod_spec)
-        deployment_spec = V1DeploymentSpec(replicas=1, selector=V1LabelSelector(match_labels=labels),
+        pod_labels = {**labels, **self.BENCHMARK_LABELS}
+        pod_temp_spec = V1PodTemplateSpec(metadata=V1ObjectMeta(name=self.container_name, labels=pod_labels),
+                                          spec=pod_spec)
+        deployment_spec = V1DeploymentSpec(replicas=self.replicas, selector=V1LabelSelector(match_labels=labels),
                                            template=pod_temp_spec)
-        deployment = V1Deployment(metadata=V1ObjectMeta(name=self.container_name), spec=deployment_spec)
-        self.appsApi.create_namespaced_deployment(namespace=TODO_APP_NAMESPACE, body=deployment)
+        deployment = V1Deployment(metadata=V1ObjectMeta(name=self.container_name, labels=self.BENCHMARK_LABELS),
+                                  spec=deployment_spec)
+        with span('create_namespaced_deployment', self.container_name):
+            self.appsApi.create_namespaced_deployment(namespace=self.namespace, body=deployment)
 
     def __create_app_service(self, labels):
         service_spec = k8s_client.V1ServiceSpec(selector=labels,
                                                 ports=[V1ServicePort(port=self.container_port,
-                                                                     node_port=self.host_port + 22000)],
+                                                                     node_port=self.node_port())],
                                                 type='NodePort')
-        service = k8s_client.V1Service(metadata=V1ObjectMeta(name=self.container_name), spec=service_spec)
-        self.coreApi.create_namespaced_service(namespace=TODO_APP_NAMESPACE, body=service)
+        service = k8s_client.V1Service(metadata=V1ObjectMeta(name=self.container_name, labels=self.BENCHMARK_LABELS),
+                                       spec=service_spec)
+        with span('create_namespaced_service', self.container_name):
+            self.coreApi.create_namespaced_service(namespace=self.namespace, body=service)
 
     def stop_app(self):
         self.__delete_app_deployment()
         self.__delete_app_service()
 
     def __delete_app_deployment(self):
-        res = self.appsApi.list_namespaced_deployment(namespace=TODO_APP_NAMESPACE,
-                                                      field_selector=f'metadata.name={self.container_name}')
+        with span('list_namespaced_deployment', self.container_name):
+            res = self.appsApi.list_namespaced_deployment(namespace=self.namespace,
+                                                          field_selector=f'metadata.name={self.container_name}')
         if not len(res.items):
             LOGGER.info(f'{self.container_name} deployment is not running')
         else:
             LOGGER.warning(f'{self.container_name} deployment is running')
-            self.appsApi.delete_namespaced_deployment(name=self.container_name, namespace=TODO_APP_NAMESPACE)
-            time.sleep(5)
+            with span('delete_namespaced_deployment', self.container_name):
+                self.appsApi.delete_namespaced_deployment(name=self.container_name, namespace=self.namespace)
+            with span('sleep', self.container_name, 'sleep'):
+                time.sleep(5)
             LOGGER.info(f'{self.container_name} deployment is stopped')
 
     def __delete_app_service(self):
-        res = self.coreApi.list_namespaced_service(namespace=TODO_APP_NAMESPACE,
-                                                   field_selector=f'metadata.name={self.container_name}')
+        with span('list_namespaced_service', self.container_name):
+            res = self.coreApi.list_namespaced_service(namespace=self.namespace,
+                                                       field_selector=f'metadata.name={self.container_name}')
         if not len(res.items):
             LOGGER.info(f'{self.container_name} service is not running')
         else:
             LOGGER.warning(f'{self.container_name} service is running')
-            self.coreApi.delete_namespaced_service(name=self.container_name, namespace=TODO_APP_NAMESPACE)
-            time.sleep(1)
+            with span('delete_namespaced_service', self.container_name):
+                self.coreApi.delete_namespaced_service(name=self.container_name, namespace=self.namespace)
+            with span('sleep', self.container_name, 'sleep'):
+                time.sleep(1)
             LOGGER.info(f'{self.container_name} service is stopped')
 
     def memory_usage(self):
@@ -154,16 +422,13 @@ class KubernetesPlatformManager(PlatformManager):
         attempt = 0
         while not done and attempt < self.MAX_ATTEMPT:
             try:
-                ret_metrics = self.apiClient.call_api(
-                    f'/apis/metrics.k8s.io/v1beta1/namespaces/{TODO_APP_NAMESPACE}/pods/{pod_name}', 'GET',
-                    auth_settings=['BearerToken'], response_type='json', _preload_content=False)
-                response = json.loads(ret_metrics[0].data.decode('utf-8'))
-                mem_usage = response['containers'][0]['usage']['memory']
+                mem_usage = self.__pod_usage(pod_name)['memory']
                 LOGGER.debug(f'mem_usage={mem_usage}')
             except (ApiException, IOError):
                 sleeping_time = 10
                 LOGGER.info(f'attempt {attempt+1}: sleeping {sleeping_time} sec to get the metrics of {pod_name}')
-                time.sleep(sleeping_time)
+                with span('sleep', self.container_name, 'sleep'):
+                    time.sleep(sleeping_time)
                 attempt += 1
             else:
                 done = True
@@ -174,17 +439,179 @@ class KubernetesPlatformManager(PlatformManager):
         match = re.search(self.MEMORY_USAGE_PATTERN, mem_usage)
         return round(bytesto(int(match.group(1)), from_=match.group(2)), 1)
 
+    def __pod_usage(self, pod_name):
+        with span('get pod metrics', self.container_name):
+            ret_metrics = self.apiClient.call_api(
+                f'/apis/metrics.k8s.io/v1beta1/namespaces/{self.namespace}/pods/{pod_name}', 'GET',
+                auth_settings=['BearerToken'], response_type='json', _preload_content=False)
+        response = json.loads(ret_metrics[0].data.decode('utf-8'))
+        return response['containers'][0]['usage']
+
+    @classmethod
+    def to_cores(cls, cpu_usage):
+        """cores of a metrics API cpu quantity, e.g. 12345678n, 250m or 1"""
+        units = {'n': 1e-9, 'u': 1e-6, 'm': 1e-3}
+        return float(cpu_usage[:-1]) * units[cpu_usage[-1]] if cpu_usage[-1] in units else float(cpu_usage)
+
+    def stats_stream(self, interval=5):
+        """yields (memory Mb, cpu %) samples from the metrics API, nothing is exec'd into the pod under measurement
+
+        The metrics are missing until metrics-server has scraped the new pod, the stream ends with the pod.
+        """
+        while True:
+            time.sleep(interval)
+            try:
+                usage = self.__pod_usage(self.__get_running_pod())
+            except PlatformException:
+                return
+            except (ApiException, IOError, KeyError, IndexError) as e:
+                LOGGER.debug(f'no metrics of {self.container_name} yet: {e}')
+                continue
+            match = re.search(self.MEMORY_USAGE_PATTERN, usage['memory'])
+            memory = bytesto(int(match.group(1)), from_=match.group(2))
+            yield round(memory, 1), round(self.to_cores(usage['cpu']) * 100, 1)
+
+    def cpu_time(self):
+        # metrics-server only reports a rate, the cumulative usage comes from the cgroup of the pod
+        return self.cgroup_cpu_time()
+
     def logs(self):
         pod_name = self.__get_running_pod()
-        return self.coreApi.read_namespaced_pod_log(namespace=TODO_APP_NAMESPACE, name=pod_name, pretty=True,
-                                                    follow=True, _preload_content=False).stream()
+        with span('read_namespaced_pod_log', self.container_name, 'poll'):
+            return self.coreApi.read_namespaced_pod_log(namespace=self.namespace, name=pod_name, pretty=True,
+                                                        follow=True, _preload_content=False).stream()
+
+    def log_time(self, line):
+        try:
+            pod_name = self.__get_running_pod()
+            with span('read_namespaced_pod_log', self.container_name, timestamps=True):
+                timestamped_logs = self.coreApi.read_namespaced_pod_log(namespace=self.namespace, name=pod_name,
+                                                                        timestamps=True, _preload_content=False).data
+        except (PlatformException, ApiException) as e:
+            LOGGER.debug(f'no log timestamps of {self.container_name}: {e}')
+            return None
+        return self.find_log_time(timestamped_logs, line)
+
+    def node_port(self):
+        return self.host_port + self.NODE_PORT_OFFSET
+
+    def app_url(self, path=''):
+        return f'http://{K8S_NODE_HOST}:{self.node_port()}{path}'
+
+    def scale(self, replicas):
+        with span('patch_namespaced_deployment_scale', self.container_name, replicas=replicas):
+            self.appsApi.patch_namespaced_deployment_scale(name=self.container_name, namespace=self.namespace,
+                                                           body={'spec': {'replicas': replicas}})
+
+    def pod_names(self):
+        with span('list_namespaced_pod', self.container_name):
+            pods = self.coreApi.list_namespaced_pod(namespace=self.namespace,
+                                                    label_selector=f'app={self.container_name}')
+        return {pod.metadata.name for pod in pods.items}
+
+    def rollout_restart(self):
+        """triggers a rolling restart the same way as kubectl rollout restart"""
+        restarted_at = datetime.now(timezone.utc).isoformat()
+        annotations = {'kubectl.kubernetes.io/restartedAt': restarted_at}
+        body = {'spec': {'template': {'metadata': {'annotations': annotations}}}}
+        with span('patch_namespaced_deployment', self.container_name):
+            self.appsApi.patch_namespaced_deployment(name=self.container_name, namespace=self.namespace, body=body)
+
+    def delete_pods(self):
+        """force deletes the pods of the app, they are killed without the termination grace period"""
+        with span('delete_collection_namespaced_pod', self.container_name):
+            self.coreApi.delete_collection_namespaced_pod(namespace=self.namespace, grace_period_seconds=0,
+                                                          label_selector=f'app={self.container_name}')
+
+    def wait_for_new_pods(self, old_pods, replicas, timeout=300):
+        """waits until the given number of pods, not in old_pods, are ready and returns the elapsed seconds"""
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            with span('list_namespaced_pod', self.container_name, 'poll'):
+                pods = self.coreApi.list_namespaced_pod(namespace=self.namespace,
+                                                        label_selector=f'app={self.container_name}')
+            ready_pods = [pod for pod in pods.items
+                          if pod.metadata.name not in old_pods and not pod.metadata.deletion_timestamp and
+                          any(c.type == 'Ready' and c.status == 'True' for c in pod.status.conditions or [])]
+            if len(ready_pods) >= replicas:
+                return time.time() - start_time
+            with span('sleep', self.container_name, 'sleep'):
+                time.sleep(0.2)
+        raise PlatformException(f'{self.container_name} pods are not ready within {timeout}s')
+
+    @classmethod
+    def delete_apps(cls, namespaces, timeout=300):
+        """tears down the deployments and services of all the apps in the namespaces with label selector deletes
+
+        Returns the seconds until the last pod of the apps is gone.
+        """
+        k8s_config.load_kube_config()
+        apps_api, core_api = k8s_client.AppsV1Api(), k8s_client.CoreV1Api()
+        start_time = time.time()
+        for namespace in namespaces:
+            try:
+                with span('delete_collection_namespaced_deployment', namespace):
+                    apps_api.delete_collection_namespaced_deployment(namespace=namespace,
+                                                                     label_selector=cls.BENCHMARK_SELECTOR)
+                with span('delete_collection_namespaced_service', namespace):
+                    core_api.delete_collection_namespaced_service(namespace=namespace,
+                                                                  label_selector=cls.BENCHMARK_SELECTOR)
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+                LOGGER.debug(f'{namespace} namespace does not exist')
+
+        while time.time() - start_time < timeout:
+            pods = []
+            for namespace in namespaces:
+                with span('list_namespaced_pod', namespace):
+                    pods += core_api.list_namespaced_pod(namespace=namespace,
+                                                         label_selector=cls.BENCHMARK_SELECTOR).items
+            if not pods:
+                LOGGER.info(f'the apps are deleted from {", ".join(sorted(namespaces))}')
+                return time.time() - start_time
+            LOGGER.debug(f'waiting for {len(pods)} pods to terminate')
+            time.sleep(0.5)
+        raise PlatformException(f'the pods of the apps are not deleted within {timeout}s')
+
+    def exec_output(self, command):
+        pod_name = self.__get_running_pod()
+        try:
+            with span('connect_get_namespaced_pod_exec', self.container_name, command=' '.join(command)):
+                resp = k8s_stream(self.coreApi.connect_get_namespaced_pod_exec, pod_name, self.namespace,
+                                  command=command, stderr=True, stdin=False, stdout=True, tty=False,
+                                  _preload_content=False)
+                resp.run_forever(timeout=self.EXEC_TIMEOUT)
+        except ApiException as e:
+            raise PlatformException(f'{" ".join(command)} failed in {pod_name}: {e.reason}') from e
+        output = resp.read_stdout()
+        # the error channel reports the exit status, or the reason why the command could not be run
+        status = json.loads(resp.read_channel(ERROR_CHANNEL) or '{}')
+        resp.close()
+        if status.get('status') != 'Success':
+            raise PlatformException(f'{" ".join(command)} failed in {pod_name}: '
+                                    f'{status.get("message", f"no exit status within {self.EXEC_TIMEOUT}s")}')
+        return output
+
+    def copy_from_app(self, path, dest):
+        """kubectl cp needs tar in the image"""
+        pod_name = self.__get_running_pod()
+        try:
+            with span('kubectl cp', self.container_name):
+                subprocess.run(['kubectl', 'cp', f'{self.namespace}/{pod_name}:{path}', f'{dest}'],
+                               check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except subprocess.CalledProcessError as e:
+            raise PlatformException(f'{path} cannot be copied from {pod_name}: '
+                                    f'{e.stderr.decode(errors="replace").strip()}') from e
+        return dest
 
     def __get_running_pod(self):
         running_pod = None
         attempt = 0
         while not running_pod and attempt < self.MAX_ATTEMPT:
-            pods = self.coreApi.list_namespaced_pod(namespace=TODO_APP_NAMESPACE,
-                                                    label_selector=f'app={self.container_name}')
+            with span('list_namespaced_pod', self.container_name, 'poll'):
+                pods = self.coreApi.list_namespaced_pod(namespace=self.namespace,
+                                                        label_selector=f'app={self.container_name}')
             for pod in pods.items:
                 pod_name = pod.metadata.name
                 try:
@@ -205,7 +632,8 @@ class KubernetesPlatformManager(PlatformManager):
             if not running_pod:
                 sleeping_time = 1
                 LOGGER.debug(f'attempt {attempt+1}: sleeping {sleeping_time} sec to get the running pod for {self.container_name}')
-                time.sleep(sleeping_time)
+                with span('sleep', self.container_name, 'sleep'):
+                    time.sleep(sleeping_time)
                 attempt += 1
 
         if attempt == self.MAX_ATTEMPT:
@@ -218,5 +646,7 @@ class PlatformManagerFactory:
     platformManagers = {'docker': DockerPlatformManager, 'k8s': KubernetesPlatformManager}
 
     @staticmethod
-    def create(platform, image_name, container_name, container_port, host_port=None):
-        return PlatformManagerFactory.platformManagers[platform](image_name, container_name, container_port, host_port)
+    def create(platform, image_name, container_name, container_port, host_port=None, environment=None, **options):
+        """options are passed to the platform manager, e.g. docker_host and resources for docker"""
+        return PlatformManagerFactory.platformManagers[platform](image_name, container_name, container_port, host_port,
+                                                                 environment, **options)
@@ -0,0 +1,175 @@
+import copy
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import yaml
+
+from .app_sharding import parse_resource_limits
+from .app_utils import get_image_name
+from .globals import DEFAULT_RESULT_FOLDER
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_verbose():
+    LOGGER.setLevel('DEBUG')
+
+
+class ScenarioException(Exception):
+    pass
+
+
+class Scenario:
+    """a benchmark scenario defined by a yaml spec file
+
+    The spec defines the app matrix, the build variants, the resource limits, the iterations, the load profiles and
+    the metrics to collect. It is expanded into a job plan: the builds are deduplicated by app, build type and build
+    arguments, every job is a build x resource limit x iteration. The hash of the spec (with the defaults applied)
+    stamps every result, so the same experiment can be rerun from the spec saved next to the results.
+    """
+    FRAMEWORKS = ['spring', 'quarkus']
+    BUILD_TYPES = ['jvm', 'native']
+    PLATFORMS = ['docker', 'k8s']
+    # the startup time and memory are always collected
+    METRICS = ['profile', 'jfr', 'memory-breakdown', 'harness-overhead', 'efficiency']
+    DEFAULTS = {'description': '',
+                'platform': 'docker',
+                'builds': [{'name': 'jvm', 'type': 'jvm'}],
+                'resources': [None],
+                'iterations': 1,
+                'startup': {'timeout': 120, 'max_attempts': 10, 'replicas': 1},
+                'environment': {},
+                'db_seed': None,
+                'load': [],
+                'metrics': []}
+    LOAD_DEFAULTS = {'duration': 60, 'warmup': 30, 'concurrency': 8, 'rate': None}
+
+    def __init__(self, spec):
+        self.spec = self.normalize(spec)
+        self.name = self.spec['name']
+        self.hash = hashlib.sha256(json.dumps(self.spec, sort_keys=True).encode()).hexdigest()[:12]
+
+    @classmethod
+    def load(cls, spec_file):
+        with open(spec_file, 'r') as f:
+            spec = yaml.safe_load(f.read())
+        if not isinstance(spec, dict):
+            raise ScenarioException(f'{spec_file} is not a scenario spec')
+        spec.setdefault('name', Path(spec_file).stem)
+        return cls(spec)
+
+    @classmethod
+    def normalize(cls, spec):
+        """applies the defaults and validates the spec"""
+        spec = {**copy.deepcopy(cls.DEFAULTS), **copy.deepcopy(spec)}
+        spec['startup'] = {**cls.DEFAULTS['startup'], **(spec['startup'] or {})}
+        unknown = set(spec) - set(cls.DEFAULTS) - {'name', 'apps'}
+        if unknown:
+            raise ScenarioException(f'unknown scenario keys: {", ".join(sorted(unknown))}')
+        if spec['platform'] not in cls.PLATFORMS:
+            raise ScenarioException(f'unknown platform: {spec["platform"]}')
+
+        apps = spec.get('apps') or []
+        if not apps:
+            raise ScenarioException('the scenario has no apps')
+        for app in apps:
+            if app.get('framework') not in cls.FRAMEWORKS:
+                raise ScenarioException(f'{app.get("name")}: the framework must be one of {cls.FRAMEWORKS}')
+            app.setdefault('path', f'todo-app/{app["name"]}')
+            app.setdefault('host_port', app['container_port'])
+            app.setdefault('java_version', 8)
+        app_names = [app['name'] for app in apps]
+
+        for build in spec['builds']:
+            build.setdefault('type', build['name'])
+            build.setdefault('args', [])
+            build.setdefault('apps', app_names)
+            if build['type'] not in cls.BUILD_TYPES:
+                raise ScenarioException(f'{build["name"]}: the build type must be one of {cls.BUILD_TYPES}')
+            for app_name in build['apps']:
+                if app_name not in app_names:
+                    raise ScenarioException(f'{build["name"]}: unknown app {app_name}')
+        for app in apps:
+            if app['framework'] == 'spring' and any(build['type'] != 'jvm' for build in spec['builds']
+                                                    if app['name'] in build['apps']):
+                raise ScenarioException(f'{app["name"]}: spring apps have jvm builds only')
+
+        spec['resources'] = [cls.to_resources(resources) for resources in spec['resources'] or [None]]
+        spec['load'] = [{'name': f'load-{i + 1}', **cls.LOAD_DEFAULTS, **load} for i, load in enumerate(spec['load'])]
+        unknown = set(spec['metrics']) - set(cls.METRICS)
+        if unknown:
+            raise ScenarioException(f'unknown metrics: {", ".join(sorted(unknown))}')
+        if 'efficiency' in spec['metrics'] and not spec['load']:
+            raise ScenarioException('the efficiency metric needs a load profile')
+        return spec
+
+    @staticmethod
+    def to_resources(resources):
+        """accepts memory:cpus strings (as --resource-limits) or {memory, cpus} mappings"""
+        if isinstance(resources, str):
+            return parse_resource_limits([resources])[0]
+        return {'memory': resources.get('memory'), 'cpus': resources.get('cpus')} if resources else None
+
+    @property
+    def platform(self):
+        return self.spec['platform']
+
+    @property
+    def metrics(self):
+        return self.spec['metrics']
+
+    def stamp(self):
+        return f'{self.name}@{self.hash}'
+
+    def builds(self):
+        """the unique builds of the scenario, the build variants with the same type and arguments share a build"""
+        builds = {}
+        for build in self.spec['builds']:
+            for app in self.spec['apps']:
+                if app['name'] not in build['apps']:
+                    continue
+                key = (app['name'], build['type'], tuple(build['args']))
+                if key not in builds:
+                    base_image = app['name'] if app['framework'] == 'spring' else \
+                        get_image_name(app['path'], build['type'])
+                    # every build gets its own image, the builds write into the base image one after the other
+                    image = f'{base_image}-{build["name"]}'
+                    builds[key] = {'app': app, 'type': build['type'], 'args': build['args'], 'base_image': base_image,
+                                   'image': image, 'variants': []}
+                builds[key]['variants'].append(build['name'])
+        return list(builds.values())
+
+    def jobs(self):
+        """the build x resource limit x iteration job plan"""
+        return [{'build': build, 'resources': resources, 'iteration': iteration}
+                for build in self.builds()
+                for resources in self.spec['resources']
+                for iteration in range(self.spec['iterations'])]
+
+    @staticmethod
+    def job_name(job):
+        resources = job['resources']
+        limits = f' {resources["memory"] or "-"}:{resources["cpus"] or "-"}' if resources else ''
+        return f'{job["build"]["image"]}{limits} #{job["iteration"] + 1}'
+
+    def platform_options(self, resources):
+        startup = self.spec['startup']
+        if self.platform == 'k8s':
+            return {'replicas': startup['replicas'], 'max_attempts': startup['max_attempts'],
+                    'own_namespace': bool(resources), 'quota': resources}
+        return {'max_attempts': startup['max_attempts'], 'resources': resources}
+
+    def save(self, table, spec_file=None):
+        """saves the spec and the stamped results side by side, returns the result file"""
+        Path(DEFAULT_RESULT_FOLDER).mkdir(exist_ok=True)
+        prefix = Path(DEFAULT_RESULT_FOLDER) / f'{self.name}-{self.hash}'
+        with open(f'{prefix}.yml', 'w') as f:
+            yaml.safe_dump(self.spec, f, sort_keys=False)
+        result_file = f'{prefix}.json'
+        with open(result_file, 'w') as f:
+            json.dump({'scenario': self.name, 'hash': self.hash, 'spec_file': spec_file, 'results': table}, f,
+                      indent=2, default=str)
+        LOGGER.info(f'{self.stamp()} results are saved to {result_file}')
+        return result_file